@@ -0,0 +1,67 @@
+#!/usr/bin/python
+"""
+Benchmark of popup text cleaning:
+---------------------------------
+
+Measures the per event cost of cleaning popup text with PopupCleaner, with and
+without memoization of repeated popups, compared with the previous
+implementation.
+
+    python -m benchmarks.bench_cleaner --events 100000
+
+"""
+
+import argparse
+import json
+from os.path import join
+from random import Random
+from time import perf_counter
+
+from benchmarks.legacy import clean_popup
+
+from hdx.scraper.idmc.idu.cleaner import PopupCleaner
+
+fixture = join("tests", "fixtures", "idmc_idu.json")
+
+
+def make_popups(size, unique, seed=0):
+    with open(fixture) as fp:
+        template = [event["standard_popup_text"] for event in json.load(fp)]
+    rng = Random(seed)
+    popups = []
+    for i in range(size):
+        popup = template[i % len(template)]
+        # Vary the figure so that only some popups repeat exactly
+        popups.append(
+            popup.replace("displacements", f"{rng.randrange(unique)} displacements")
+        )
+    return popups
+
+
+def per_event(function, popups):
+    start = perf_counter()
+    for popup in popups:
+        function(popup)
+    return (perf_counter() - start) / len(popups) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--unique", type=int, default=50)
+    args = parser.parse_args()
+    popups = make_popups(args.events, args.unique)
+    cleaner = PopupCleaner()
+    for popup in popups[:1000]:
+        assert cleaner.clean_popup_text(popup) == clean_popup(popup)
+    print(f"events: {args.events}")
+    print(f"previous: {per_event(clean_popup, popups):.2f}us per event")
+    print(f"compiled: {per_event(cleaner.clean_popup_text, popups):.2f}us per event")
+    print(
+        f"compiled and memoized: {per_event(cleaner.clean_popup, popups):.2f}us per event"
+    )
+    print(f"cache: {cleaner.clean_popup.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/python
+"""
+Benchmark of event storage:
+---------------------------
+
+Compares the memory retained by the events of a large synthetic feed when
+stored as per event dictionaries with the compact EventStore.
+
+    python -m benchmarks.bench_events --events 200000
+
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+
+from hdx.utilities.dateparse import parse_date
+
+from benchmarks.bench_aggregation import make_feed
+from benchmarks.legacy import two_pass
+
+from hdx.scraper.idmc.idu.pipeline import Pipeline
+
+
+def parsed_events(feed):
+    # Decode each event separately so that, as when parsing the feed, no
+    # strings are shared between events. The parsed feed counts towards the
+    # peak but only the stored events are retained.
+    for event in feed:
+        yield json.loads(json.dumps(event))
+
+
+def retained_memory(function, feed, territories, today, min_date):
+    pipeline = Pipeline(None, None, today, None)
+    pipeline.idmc_territories = territories
+    gc.collect()
+    tracemalloc.start()
+    events = list(parsed_events(feed))
+    function(pipeline, events, min_date)
+    del events
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, peak
+
+
+def single_pass(pipeline, events, min_date):
+    pipeline.aggregate_events(events, min_date)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=200000)
+    args = parser.parse_args()
+    feed, territories = make_feed(args.events)
+    today = parse_date("2023-11-14")
+    min_date = f"{today.year - 3}-01-01"
+    print(f"events: {args.events}")
+    for name, function in (("dicts", two_pass), ("event store", single_pass)):
+        current, peak = retained_memory(function, feed, territories, today, min_date)
+        print(
+            f"{name}: {current / 1024 / 1024:.1f}MB retained, {peak / 1024 / 1024:.1f}MB peak"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/python
+"""
+Benchmark of the publish loop:
+------------------------------
+
+Runs main on a synthetic feed against an in-process fake CKAN server with
+optional latency and failure injection and reports the number of HDX API
+requests, bytes and time by action and by country. The first run creates the
+datasets and showcases and later runs update them.
+
+    python -m benchmarks.bench_publish --events 20000 --latency 0.05 --runs 2
+
+"""
+
+import argparse
+import json
+from os import chdir, environ, getcwd, makedirs
+from os.path import join
+from time import perf_counter
+
+from hdx.utilities.dateparse import now_utc
+from hdx.utilities.path import temp_dir
+from hdx.utilities.saver import save_json
+
+from benchmarks.fakeckan import FakeCKAN
+from benchmarks.offline import setup_offline_configuration
+from benchmarks.synthetic import SyntheticFeed
+
+from hdx.scraper.idmc.idu.__main__ import main as run_main
+from hdx.scraper.idmc.idu.pipeline import Pipeline
+
+
+def prepare_folder(folder, events, seed=0, countries=None):
+    """Write a synthetic feed to the saved data folder used by main and cache
+    its showcase urls as existing so that they are not probed
+
+    Args:
+        folder (str): Folder in which to run main
+        events (int): Number of events
+        seed (int): Seed of synthetic feed. Defaults to 0.
+        countries (list[str] | None): Countries of events. Defaults to None (all).
+
+    Returns:
+        str: Path to showcase cache
+    """
+    today = now_utc()
+    feed = SyntheticFeed(seed, today.year - 1, today.year, countries)
+    saved_dir = join(folder, "saved_data")
+    makedirs(saved_dir, exist_ok=True)
+    feed.write(join(saved_dir, "idmc_idu.json"), events)
+    pipeline = Pipeline({}, None, today, folder)
+    pipeline.countrynamemapping = {
+        event["iso3"]: event["country"] for event in feed.generate(events)
+    }
+    checked = today.isoformat()
+    cache = {
+        pipeline.get_showcase_url(countryiso): checked
+        for countryiso in pipeline.countrynamemapping
+    }
+    showcase_cache = join(folder, "showcases.json")
+    save_json(cache, showcase_cache)
+    return showcase_cache
+
+
+def run_publish(folder, ckan, showcase_cache, runs=1, **kwargs):
+    """Run main against the fake CKAN server, returning a report of the HDX
+    API requests of each run
+
+    Args:
+        folder (str): Folder prepared by prepare_folder
+        ckan (FakeCKAN): Started fake CKAN server
+        showcase_cache (str): Path to showcase cache
+        runs (int): Number of runs. Defaults to 1.
+        **kwargs: Other arguments to pass to main
+
+    Returns:
+        list[dict]: Report of each run
+    """
+    setup_offline_configuration(hdx_url=ckan.url, hdx_key="benchmark")
+    cwd = getcwd()
+    # The IDMC key stops main looking for ~/.extraparams.yaml
+    environment = {"TEMP_DIR": str(folder), "IDMC_KEY": "benchmark"}
+    saved_environment = {key: environ.get(key) for key in environment}
+    # main reads the saved feed relative to the working directory
+    chdir(folder)
+    environ.update(environment)
+    reports = []
+    try:
+        for _ in range(runs):
+            ckan.reset_stats()
+            start = perf_counter()
+            run_main(use_saved=True, showcase_cache=showcase_cache, **kwargs)
+            report = ckan.get_report()
+            report["seconds"] = perf_counter() - start
+            reports.append(report)
+    finally:
+        chdir(cwd)
+        for key, value in saved_environment.items():
+            if value is None:
+                del environ[key]
+            else:
+                environ[key] = value
+    return reports
+
+
+def print_report(run, report, countries):
+    totals = report["totals"]
+    print(
+        f"run {run}: {report['seconds']:.2f}s, {totals['requests']} requests, "
+        f"{totals['failures']} failures, {totals['request_bytes']} bytes sent, "
+        f"{totals['response_bytes']} bytes received"
+    )
+    for action, stats in sorted(report["endpoints"].items()):
+        print(
+            f"  {action}: {stats['requests']} requests, {stats['failures']} failures, "
+            f"{stats['request_bytes']} bytes sent, {stats['response_bytes']} bytes "
+            f"received, {stats['seconds']:.3f}s"
+        )
+    per_country = sorted(
+        report["countries"].items(), key=lambda item: -item[1]["seconds"]
+    )
+    for countryiso, stats in per_country[:countries]:
+        endpoints = ", ".join(
+            f"{action}={count}" for action, count in sorted(stats["endpoints"].items())
+        )
+        print(
+            f"  {countryiso}: {stats['requests']} requests, "
+            f"{stats['request_bytes']} bytes sent, {stats['seconds']:.3f}s ({endpoints})"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--fail-actions", nargs="*", default=())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--publish-workers", type=int, default=1)
+    parser.add_argument("--countries", type=int, default=10)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    with temp_dir(
+        "idmc_bench_publish", delete_on_success=True, delete_on_failure=True
+    ) as folder:
+        showcase_cache = prepare_folder(folder, args.events, args.seed)
+        with FakeCKAN(
+            latency=args.latency,
+            failure_rate=args.failure_rate,
+            fail_actions=args.fail_actions,
+            seed=args.seed,
+        ) as ckan:
+            reports = run_publish(
+                folder,
+                ckan,
+                showcase_cache,
+                runs=args.runs,
+                publish_workers=args.publish_workers,
+            )
+    for run, report in enumerate(reports, 1):
+        print_report(run, report, args.countries)
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(reports, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
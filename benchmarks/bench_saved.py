@@ -0,0 +1,83 @@
+#!/usr/bin/python
+"""
+Benchmark of saved feed loading:
+--------------------------------
+
+Compares the size and load time of the raw saved feed with the compressed
+saved feed written with --compress-saved, loading both in full and
+incrementally as get_countriesdata does.
+
+    python -m benchmarks.bench_saved --events 500000
+
+"""
+
+import argparse
+import json
+from os.path import getsize, join
+from time import perf_counter
+
+import ijson
+from hdx.utilities.path import temp_dir
+
+from benchmarks.synthetic import SyntheticFeed
+
+from hdx.scraper.idmc.idu.savedfeed import (
+    read_saved_events,
+    saved_filename,
+    write_saved_events,
+)
+
+
+def read_raw(path, stream):
+    with open(path, "rb") as fp:
+        if stream:
+            yield from ijson.items(fp, "item", use_float=True)
+        else:
+            yield from json.load(fp)
+
+
+def time_load(function, path, stream, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        events = 0
+        for _ in function(path, stream):
+            events += 1
+        timings.append(perf_counter() - start)
+    return min(timings), events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--start-year", type=int, default=2018)
+    parser.add_argument("--min-date", default="2022-01-01")
+    args = parser.parse_args()
+    feed = SyntheticFeed(0, args.start_year, 2023)
+    with temp_dir(
+        "idmc_bench_saved", delete_on_success=True, delete_on_failure=True
+    ) as folder:
+        raw_path = join(folder, "idmc_idu.json")
+        feed.write(raw_path, args.events)
+        saved_path = join(folder, saved_filename)
+        for _ in write_saved_events(
+            feed.generate(args.events), saved_path, args.min_date
+        ):
+            pass
+        print(f"events: {args.events} from {args.start_year} to 2023")
+        print(f"raw: {getsize(raw_path)} bytes")
+        print(f"compressed: {getsize(saved_path)} bytes since {args.min_date}")
+        for stream in (False, True):
+            mode = "incremental" if stream else "full"
+            raw_time, _ = time_load(read_raw, raw_path, stream, args.repeat)
+            saved_time, saved = time_load(
+                read_saved_events, saved_path, stream, args.repeat
+            )
+            print(f"{mode} load raw: {raw_time:.3f}s")
+            print(f"{mode} load compressed: {saved_time:.3f}s ({saved} events)")
+            print(f"{mode} speedup: {raw_time / saved_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+#!/usr/bin/python
+"""
+Fake CKAN:
+----------
+
+In-process stand-in for the HDX CKAN API covering the actions used when
+publishing datasets and showcases. Datasets, resources, showcases and their
+associations are kept in memory. Latency and failures can be injected per
+action and every request is accounted for by action and by country so that
+changes to the publishing path can be measured without hitting HDX.
+
+"""
+
+import json
+import re
+from copy import deepcopy
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from random import Random
+from threading import Lock, Thread
+from time import perf_counter, sleep
+from uuid import uuid4
+
+country_pattern = re.compile(r"^([a-z]{3})-idmc-idu")
+action_prefixes = ("package_", "ckanext_", "organization_", "user_")
+
+
+class NotFound(Exception):
+    pass
+
+
+class ValidationError(Exception):
+    pass
+
+
+def new_stats():
+    return {
+        "requests": 0,
+        "failures": 0,
+        "request_bytes": 0,
+        "response_bytes": 0,
+        "seconds": 0.0,
+    }
+
+
+def add_stats(stats, failed, request_bytes, response_bytes, seconds):
+    stats["requests"] += 1
+    if failed:
+        stats["failures"] += 1
+    stats["request_bytes"] += request_bytes
+    stats["response_bytes"] += response_bytes
+    stats["seconds"] += seconds
+
+
+class FakeCKANHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Otherwise delayed acks stall each keep-alive request by tens of ms
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        start = perf_counter()
+        action = self.path.rstrip("/").rsplit("/", 1)[-1]
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, response, country = self.server.ckan.handle(
+            action, self.headers.get("Content-Type", ""), body
+        )
+        data = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.ckan.account(
+            action, country, status, len(body), len(data), perf_counter() - start
+        )
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeCKAN:
+    def __init__(
+        self,
+        latency=0.0,
+        action_latency=None,
+        failure_rate=0.0,
+        fail_actions=(),
+        seed=0,
+        organisation_id="647d9d8c-4cac-4c33-b639-649aad1c2893",
+    ):
+        self.latency = latency
+        self.action_latency = action_latency or {}
+        self.failure_rate = failure_rate
+        self.fail_actions = set(fail_actions)
+        self.random = Random(seed)
+        self.organisation_id = organisation_id
+        self.packages = {}
+        self.showcases = {}
+        self.associations = set()
+        self.uploads = {}
+        self.lock = Lock()
+        self.endpoints = {}
+        self.countries = {}
+        self.server = None
+        self.thread = None
+        self.url = None
+
+    def start(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeCKANHandler)
+        self.server.daemon_threads = True
+        self.server.ckan = self
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        return self.url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def reset_stats(self):
+        with self.lock:
+            self.endpoints = {}
+            self.countries = {}
+
+    @staticmethod
+    def parse_body(content_type, body):
+        """Parse a JSON or multipart form request body into the action data
+        and any uploaded files
+
+        Args:
+            content_type (str): Content type header
+            body (bytes): Request body
+
+        Returns:
+            tuple[dict, dict]: Data and sizes of uploaded files by field name
+        """
+        if not content_type.startswith("multipart/form-data"):
+            if not body:
+                return {}, {}
+            return json.loads(body), {}
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        data = {}
+        files = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            payload = part.get_payload(decode=True)
+            if part.get_filename():
+                files[name] = (part.get_filename(), len(payload))
+            else:
+                data[name] = payload.decode()
+        return data, files
+
+    def handle(self, action, content_type, body):
+        """Handle a CKAN action, injecting any latency and failure
+
+        Args:
+            action (str): CKAN action
+            content_type (str): Content type header
+            body (bytes): Request body
+
+        Returns:
+            tuple[int, dict, str | None]: HTTP status, response and country
+        """
+        latency = self.action_latency.get(action, self.latency)
+        if latency:
+            sleep(latency)
+        try:
+            data, files = self.parse_body(content_type, body)
+        except ValueError:
+            return 400, self.error("Validation Error", "Invalid request body"), None
+        with self.lock:
+            country = self.get_country(data)
+            if action in self.fail_actions or (
+                self.failure_rate and self.random.random() < self.failure_rate
+            ):
+                return 503, self.error("Internal Error", "Injected failure"), country
+            function = None
+            if action.startswith(action_prefixes):
+                function = getattr(self, action, None)
+            if function is None:
+                return (
+                    400,
+                    self.error("Bad Request", f"Unknown action {action}"),
+                    country,
+                )
+            try:
+                result = function(data, files)
+            except NotFound as e:
+                return 404, self.error("Not Found Error", str(e)), country
+            except ValidationError as e:
+                return 409, self.error("Validation Error", str(e)), country
+            return 200, {"success": True, "result": result}, country
+
+    @staticmethod
+    def error(error_type, message):
+        return {"success": False, "error": {"__type": error_type, "message": message}}
+
+    def account(self, action, country, status, request_bytes, response_bytes, seconds):
+        failed = status >= 500
+        with self.lock:
+            stats = self.endpoints.get(action)
+            if stats is None:
+                stats = self.endpoints[action] = new_stats()
+            add_stats(stats, failed, request_bytes, response_bytes, seconds)
+            country_stats = self.countries.get(country or "-")
+            if country_stats is None:
+                country_stats = self.countries[country or "-"] = new_stats()
+                country_stats["endpoints"] = {}
+            add_stats(country_stats, failed, request_bytes, response_bytes, seconds)
+            endpoints = country_stats["endpoints"]
+            endpoints[action] = endpoints.get(action, 0) + 1
+
+    def get_country(self, data):
+        # Requests are attributed to countries by the names of the datasets
+        # and showcases they refer to
+        names = []
+        match = data.get("match")
+        if isinstance(match, str):
+            match = json.loads(match)
+        if isinstance(match, dict):
+            names.extend(match.values())
+        package = data.get("package")
+        if isinstance(package, dict):
+            names.append(package.get("name", ""))
+        for key in ("name", "id", "package_id", "showcase_id"):
+            value = data.get(key)
+            if isinstance(value, str):
+                names.append(value)
+        for name in names:
+            for objects in (self.packages, self.showcases):
+                if name in objects:
+                    name = objects[name]["name"]
+            result = country_pattern.match(name)
+            if result:
+                return result.group(1).upper()
+        return None
+
+    def get_report(self):
+        """Get requests, failures, bytes and seconds by action and by country
+
+        Returns:
+            dict: Report
+        """
+        with self.lock:
+            totals = new_stats()
+            for stats in self.endpoints.values():
+                for key, value in stats.items():
+                    totals[key] += value
+            return {
+                "totals": totals,
+                "endpoints": deepcopy(self.endpoints),
+                "countries": deepcopy(self.countries),
+            }
+
+    @staticmethod
+    def find(objects, data, kind):
+        key = data.get("id") or data.get("name")
+        for value in objects.values():
+            if key in (value["id"], value["name"]):
+                return value
+        raise NotFound(f"{kind} {key} not found")
+
+    def save_resources(self, package, files=None):
+        for i, resource in enumerate(package.get("resources", [])):
+            resource.setdefault("id", str(uuid4()))
+            resource["package_id"] = package["id"]
+            resource["position"] = i
+            upload = (files or {}).get(f"update__resources__{i}__upload")
+            if upload:
+                filename, size = upload
+                resource["url"] = (
+                    f"{self.url}/dataset/{package['id']}/resource/"
+                    f"{resource['id']}/download/{filename}"
+                )
+                resource["url_type"] = "upload"
+                resource["size"] = size
+                self.uploads[resource["id"]] = size
+
+    def user_show(self, data, files):
+        return {"id": "benchmark", "name": "benchmark", "sysadmin": False}
+
+    def organization_list_for_user(self, data, files):
+        return [{"id": self.organisation_id, "name": "idmc"}]
+
+    def package_show(self, data, files):
+        return self.find(self.packages, data, "Dataset")
+
+    def package_create(self, data, files):
+        if any(package["name"] == data["name"] for package in self.packages.values()):
+            raise ValidationError(f"Dataset {data['name']} already exists")
+        package = deepcopy(data)
+        package["id"] = str(uuid4())
+        package["state"] = "active"
+        self.save_resources(package)
+        self.packages[package["id"]] = package
+        return package
+
+    def package_update(self, data, files):
+        package = self.find(self.packages, data, "Dataset")
+        package.clear()
+        package.update(deepcopy(data))
+        self.save_resources(package)
+        return package
+
+    def package_revise(self, data, files):
+        package = self.find(self.packages, json.loads(data["match"]), "Dataset")
+        for key in json.loads(data.get("filter", "[]")):
+            if key.startswith("-") and "__" not in key:
+                package.pop(key[1:], None)
+        update = json.loads(data.get("update", "{}"))
+        resources = update.pop("resources", None)
+        package.update(update)
+        if resources is not None:
+            existing = package.get("resources", [])
+            for i, resource in enumerate(resources):
+                if i < len(existing):
+                    existing[i].update(resource)
+                    resources[i] = existing[i]
+            package["resources"] = resources
+        self.save_resources(package, files)
+        return {"package": package}
+
+    def package_delete(self, data, files):
+        package = self.find(self.packages, data, "Dataset")
+        del self.packages[package["id"]]
+        self.associations = {
+            association
+            for association in self.associations
+            if association[0] != package["id"]
+        }
+
+    def package_search(self, data, files):
+        fq = data.get("fq", "")
+        packages = [
+            package
+            for package in self.packages.values()
+            if f"owner_org:{package.get('owner_org')}" in fq or not fq
+        ]
+        start = int(data.get("start", 0))
+        rows = int(data.get("rows", 1000))
+        return {"count": len(packages), "results": packages[start : start + rows]}
+
+    def package_create_default_resource_views(self, data, files):
+        return []
+
+    def package_resource_reorder(self, data, files):
+        return {"id": data["id"], "order": data["order"]}
+
+    def ckanext_showcase_show(self, data, files):
+        return self.find(self.showcases, data, "Showcase")
+
+    def ckanext_showcase_create(self, data, files):
+        showcase = deepcopy(data)
+        showcase["id"] = str(uuid4())
+        self.showcases[showcase["id"]] = showcase
+        return showcase
+
+    def ckanext_showcase_update(self, data, files):
+        showcase = self.find(self.showcases, data, "Showcase")
+        showcase.update(deepcopy(data))
+        return showcase
+
+    def ckanext_showcase_delete(self, data, files):
+        showcase = self.find(self.showcases, data, "Showcase")
+        del self.showcases[showcase["id"]]
+
+    def ckanext_showcase_package_association_create(self, data, files):
+        package = self.find(self.packages, {"id": data["package_id"]}, "Dataset")
+        showcase = self.find(self.showcases, {"id": data["showcase_id"]}, "Showcase")
+        self.associations.add((package["id"], showcase["id"]))
+        return {"package_id": package["id"], "showcase_id": showcase["id"]}
+
+    def ckanext_showcase_package_list(self, data, files):
+        showcase = self.find(self.showcases, {"id": data["showcase_id"]}, "Showcase")
+        return [
+            self.packages[package_id]
+            for package_id, showcase_id in sorted(self.associations)
+            if showcase_id == showcase["id"]
+        ]
+
+    def ckanext_package_showcase_list(self, data, files):
+        package = self.find(self.packages, {"id": data["package_id"]}, "Dataset")
+        return [
+            self.showcases[showcase_id]
+            for package_id, showcase_id in sorted(self.associations)
+            if package_id == package["id"]
+        ]
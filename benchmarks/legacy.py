@@ -0,0 +1,71 @@
+#!/usr/bin/python
+"""
+Legacy implementations:
+-----------------------
+
+Implementations replaced by faster ones, kept as baselines for the
+benchmarks.
+
+"""
+
+import re
+
+from hdx.utilities.dictandlist import dict_of_lists_add
+from hdx.utilities.matching import multiple_replace
+
+regex_popup = re.compile(r"(.*)<a href=\\?\"(.*)\\?\"target")
+
+
+def clean_popup(popup):
+    popup = popup.replace("\n", " ")
+    match = regex_popup.match(popup)
+    if match:
+        text, link = match.groups()
+    else:
+        text = popup
+        link = None
+    text = multiple_replace(text, {"<br>": "", "<b>": "", "</b>": ".", "\t": " "})
+    text = re.sub(" +", " ", text)
+    return text.replace(" .", ".").strip(), link
+
+
+def two_pass(pipeline, json, min_date):
+    pipeline.events = {}
+    for event in json:
+        countryiso = event["iso3"]
+        if countryiso not in pipeline.idmc_territories:
+            continue
+        end_date = event["displacement_end_date"]
+        if end_date < min_date:
+            continue
+        start_date = event["displacement_start_date"]
+        min_start_date = pipeline.countrystartdate.get(countryiso)
+        if min_start_date:
+            if start_date < min_start_date:
+                pipeline.countrystartdate[countryiso] = start_date
+        else:
+            pipeline.countrystartdate[countryiso] = start_date
+        max_end_date = pipeline.countryenddate.get(countryiso)
+        if max_end_date:
+            if end_date > max_end_date:
+                pipeline.countryenddate[countryiso] = end_date
+        else:
+            pipeline.countryenddate[countryiso] = end_date
+        pipeline.countrynamemapping[countryiso] = event["country"]
+
+    for event in json:
+        countryiso = event["iso3"]
+        if countryiso not in pipeline.countrynamemapping:
+            continue
+        end_date = event["displacement_end_date"]
+        if end_date < min_date:
+            continue
+        event["description"], event["link"] = clean_popup(event["standard_popup_text"])
+        del event["standard_popup_text"]
+        del event["standard_info_text"]
+        event_type = event["type"]
+        if event_type:
+            event["combined_type"] = event_type
+        else:
+            event["combined_type"] = event["displacement_type"]
+        dict_of_lists_add(pipeline.events, countryiso, event)
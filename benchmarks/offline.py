@@ -0,0 +1,71 @@
+#!/usr/bin/python
+"""
+Offline configuration:
+----------------------
+
+Sets up HDX configuration, locations, tags and resource formats without any
+network access so that the pipeline can be benchmarked on synthetic feeds.
+
+"""
+
+from os.path import join
+
+from hdx.api.configuration import Configuration
+from hdx.api.locations import Locations
+from hdx.data.resource import Resource
+from hdx.data.vocabulary import Vocabulary
+from hdx.location.country import Country
+from hdx.utilities.path import script_dir_plus_file
+from hdx.utilities.useragent import UserAgent
+
+from hdx.scraper.idmc.idu.pipeline import Pipeline
+
+tag_mappings = {
+    "conflict": "conflict-violence",
+    "cyclone": "cyclones-hurricanes-typhoons",
+    "disaster": "natural disasters",
+    "drought": "drought",
+    "earthquake": "earthquake-tsunami",
+    "erosion": "natural disasters",
+    "flood": "flooding-storm surge",
+    "hurricane": "cyclones-hurricanes-typhoons",
+    "storm": "cyclones-hurricanes-typhoons",
+    "typhoon": "cyclones-hurricanes-typhoons",
+    "wildfire": "fires",
+}
+
+
+def setup_offline_configuration(hdx_url=None, hdx_key=None):
+    UserAgent.set_global("benchmark")
+    kwargs = {}
+    if hdx_url:
+        kwargs["hdx_url"] = hdx_url
+    if hdx_key:
+        kwargs["hdx_key"] = hdx_key
+    Configuration._create(
+        hdx_read_only=not hdx_key,
+        hdx_site="prod",
+        project_config_yaml=script_dir_plus_file(
+            join("config", "project_configuration.yaml"), Pipeline
+        ),
+        **kwargs,
+    )
+    Country.countriesdata(use_live=False)
+    Locations.set_validlocations(
+        [
+            {"name": countryiso.lower(), "title": countryiso}
+            for countryiso in Country.countriesdata()["countries"]
+        ]
+    )
+    tags = set(tag_mappings.values())
+    tags.update(("displacement", "internally displaced persons-idp"))
+    Vocabulary._tags_dict = {tag: {"Action to Take": "ok"} for tag in tags}
+    for tag, new_tag in tag_mappings.items():
+        Vocabulary._tags_dict[tag] = {"Action to Take": "merge", "New Tag(s)": new_tag}
+    Vocabulary._approved_vocabulary = {
+        "tags": [{"name": tag} for tag in sorted(tags)],
+        "id": "4e61d464-4943-4e97-973a-84673c1aaa87",
+        "name": "approved",
+    }
+    Resource.set_formatsdict({"csv": "csv", "json": "json"})
+    return Configuration.read()
@@ -0,0 +1,138 @@
+#!/usr/bin/python
+"""
+Benchmark suite:
+----------------
+
+Times Pipeline.get_idmc_territories, Pipeline.get_countriesdata and
+Pipeline.generate_dataset_and_showcase on synthetic feeds of increasing size
+and records their peak memory. Results are written as JSON so that they can be
+compared across versions.
+
+    python -m benchmarks.run_benchmarks --sizes 10000 100000 --output bench.json
+
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import tracemalloc
+from os.path import join
+from resource import RUSAGE_SELF, getrusage
+from time import perf_counter
+
+from hdx.utilities.dateparse import now_utc, parse_date
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+
+from benchmarks.offline import setup_offline_configuration
+from benchmarks.synthetic import SyntheticFeed
+
+from hdx.scraper.idmc.idu.pipeline import Pipeline
+
+
+def get_version():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    start = perf_counter()
+    result = function(*args)
+    seconds = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {"seconds": round(seconds, 4), "peak_bytes": peak}
+
+
+def generate_all(pipeline, countries):
+    datasets = 0
+    for country in countries:
+        dataset, _, populated = pipeline.generate_dataset_and_showcase(country["iso3"])
+        if dataset and populated:
+            datasets += 1
+    return datasets
+
+
+def run_size(configuration, size, seed, stream, today, spill_threshold=0):
+    with temp_dir(
+        f"idmc_benchmark_{size}", delete_on_success=True, delete_on_failure=True
+    ) as folder:
+        feed = SyntheticFeed(seed, today.year - 2, today.year)
+        feed_bytes = feed.write(join(folder, "idmc_idu.json"), size)
+        with Download() as downloader:
+            retriever = Retrieve(downloader, folder, folder, folder, False, True)
+            pipeline = Pipeline(
+                configuration,
+                retriever,
+                today,
+                folder,
+                stream=stream,
+                spill_threshold=spill_threshold,
+            )
+            _, territories = measure(pipeline.get_idmc_territories)
+            countries, countriesdata = measure(pipeline.get_countriesdata)
+            # Avoid checking IDMC country pages over the network
+            pipeline.showcase_urls = dict.fromkeys(pipeline.countrynamemapping, True)
+            datasets, generate = measure(generate_all, pipeline, countries)
+            events = sum(
+                len(pipeline.get_country_state(country)["events"])
+                for country in pipeline.events
+            )
+    return {
+        "events": size,
+        "feed_bytes": feed_bytes,
+        "retained_events": events,
+        "datasets": datasets,
+        "stream": stream,
+        "spill_threshold": spill_threshold,
+        "get_idmc_territories": territories,
+        "get_countriesdata": countriesdata,
+        "generate_dataset_and_showcase": generate,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--spill-threshold", type=int, default=0)
+    parser.add_argument("--today", default="2023-11-14")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+    configuration = setup_offline_configuration()
+    today = parse_date(args.today)
+    results = {
+        "version": get_version(),
+        "python": platform.python_version(),
+        "run_at": now_utc().isoformat(),
+        "seed": args.seed,
+        "results": [],
+    }
+    for size in args.sizes:
+        result = run_size(
+            configuration, size, args.seed, args.stream, today, args.spill_threshold
+        )
+        print(
+            f"{size} events: get_countriesdata {result['get_countriesdata']['seconds']}s, "
+            f"generate_dataset_and_showcase {result['generate_dataset_and_showcase']['seconds']}s"
+        )
+        results["results"].append(result)
+    results["max_rss_kb"] = getrusage(RUSAGE_SELF).ru_maxrss
+    with open(args.output, "w") as fp:
+        json.dump(results, fp, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
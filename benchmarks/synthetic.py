@@ -0,0 +1,202 @@
+#!/usr/bin/python
+"""
+Synthetic IDU feed:
+-------------------
+
+Generates realistic IDU feeds of any size from a seed. Events are spread over
+the countries in IDMC_territories.csv, the given years and the disaster and
+conflict types found in the real feed, with popup HTML in the same format.
+
+    python -m benchmarks.synthetic --events 1000000 --output idmc_idu.json
+
+"""
+
+import argparse
+import csv
+import json
+from datetime import UTC, datetime, timedelta
+from os.path import getsize, join
+from random import Random
+
+from hdx.utilities.path import script_dir_plus_file
+
+from hdx.scraper.idmc.idu.pipeline import Pipeline
+
+disaster_types = (
+    # category, subcategory, type, subtype, weight
+    ("Weather related", "Hydrological", "Flood", "Flood", 40),
+    ("Weather related", "Meteorological", "Storm", "Storm", 20),
+    (
+        "Weather related",
+        "Meteorological",
+        "Storm",
+        "Typhoon/Hurricane/Cyclone",
+        10,
+    ),
+    ("Weather related", "Hydrological", "Mass movement", "Erosion", 3),
+    ("Weather related", "Climatological", "Drought", "Drought", 3),
+    ("Weather related", "Climatological", "Wildfire", "Wildfire", 4),
+    ("Geophysical", "Geophysical", "Earthquake", "Earthquake", 5),
+)
+qualifiers = ("total", "total", "total", "approximately", "more than")
+terms = (
+    "in relief camp",
+    "destroyed housing",
+    "evacuated",
+    "displaced",
+    "forced to flee",
+)
+sources = (
+    "National Disaster Management Authority",
+    "Ministry of Home Affairs Disaster Management Division",
+    "International Organization for Migration (IOM)",
+    "Local media",
+    "UN Office for the Coordination of Humanitarian Affairs (OCHA)",
+)
+regions = ("North", "South", "East", "West", "Central", "Coastal", "Highlands")
+
+
+def get_countries():
+    path = script_dir_plus_file(join("config", "IDMC_territories.csv"), Pipeline)
+    with open(path, encoding="utf-8") as fp:
+        return [(row["iso3"], row["idmc_short_name"]) for row in csv.DictReader(fp)]
+
+
+def format_date(date):
+    return f"{date.strftime('%Y-%m-%dT%H:%M:%S')}.000Z"
+
+
+def popup_date(date):
+    # IDMC pads month names in popups to a fixed width
+    return f"{date.day:02d} {date.strftime('%B'):<9}"
+
+
+class SyntheticFeed:
+    def __init__(self, seed=0, start_year=2022, end_year=2023, countries=None):
+        self.seed = seed
+        self.start = datetime(start_year, 1, 1, tzinfo=UTC)
+        self.days = (datetime(end_year + 1, 1, 1, tzinfo=UTC) - self.start).days
+        if countries is None:
+            countries = get_countries()
+        self.countries = countries
+        # Some countries have many more events than others as in the real feed
+        rng = Random(seed)
+        self.weights = [rng.paretovariate(1.2) for _ in countries]
+        self.disaster_weights = [row[-1] for row in disaster_types]
+
+    def generate_event(self, rng, event_id):
+        countryiso, countryname = rng.choices(self.countries, self.weights)[0]
+        start_date = self.start + timedelta(
+            days=rng.randrange(self.days), hours=rng.choice((0, 11, 12))
+        )
+        end_date = start_date + timedelta(days=rng.choice((0, 0, 0, 1, 3, 10)))
+        created_at = end_date + timedelta(
+            days=rng.randrange(1, 20), seconds=rng.randrange(86400)
+        )
+        figure = int(rng.lognormvariate(4, 2)) + 1
+        region = rng.choice(regions)
+        if rng.random() < 0.15:
+            displacement_type = "Conflict"
+            category = subcategory = event_type = subtype = None
+            event_name = f"{countryname}: Conflict - {region} - {start_date:%d/%m/%Y}"
+            cause = "armed conflict"
+        else:
+            displacement_type = "Disaster"
+            category, subcategory, event_type, subtype, _ = rng.choices(
+                disaster_types, self.disaster_weights
+            )[0]
+            event_name = (
+                f"{countryname}: {event_type} - {region} - {start_date:%d/%m/%Y}"
+            )
+            cause = event_type.lower()
+        latitude = round(rng.uniform(-40, 60), 6)
+        longitude = round(rng.uniform(-120, 150), 6)
+        term = rng.choice(terms)
+        info = f"<b> {countryname}: {figure:>15} displacements ({term}), {popup_date(start_date)} - {popup_date(end_date)} </b>"
+        source = rng.choice(sources)
+        url = f"https://example.org/reports/{countryiso.lower()}/{event_id}"
+        popup = (
+            f"{info} <br> A total of {figure} people were {term} due to {cause} "
+            f"on {start_date.day} {start_date:%B} in {region} {countryname}, "
+            f"according to {source}. <br> "
+            f'<a href="{url}"target="_blank">{source} - {popup_date(end_date)} {end_date.year}</a>'
+        )
+        if rng.random() < 0.1:
+            # Some popups have no link or contain line breaks and tabs
+            popup = rng.choice((info, popup.replace(" <br> ", "\n\t<br>")))
+        return {
+            "id": event_id,
+            "country": countryname,
+            "iso3": countryiso,
+            "latitude": latitude,
+            "longitude": longitude,
+            "centroid": f"[{latitude}, {longitude}]",
+            "displacement_type": displacement_type,
+            "qualifier": rng.choice(qualifiers),
+            "figure": figure,
+            "displacement_date": format_date(start_date),
+            "displacement_start_date": format_date(start_date),
+            "displacement_end_date": format_date(end_date),
+            "year": end_date.year,
+            "event_name": event_name,
+            "event_start_date": format_date(start_date),
+            "event_end_date": format_date(end_date),
+            "category": category,
+            "subcategory": subcategory,
+            "type": event_type,
+            "subtype": subtype,
+            "standard_popup_text": popup,
+            "standard_info_text": info,
+            "old_id": None,
+            "created_at": format_date(created_at),
+        }
+
+    def generate(self, size):
+        """Generate events, the same for the same seed and size
+
+        Args:
+            size (int): Number of events
+
+        Returns:
+            Iterator[dict]: Events
+        """
+        rng = Random(self.seed)
+        for i in range(size):
+            yield self.generate_event(rng, 100000 + i)
+
+    def write(self, path, size):
+        """Write a feed as a JSON array one event at a time so that large
+        feeds can be generated in constant memory
+
+        Args:
+            path (str): Path to write feed
+            size (int): Number of events
+
+        Returns:
+            int: Size of feed in bytes
+        """
+        with open(path, "w", encoding="utf-8") as fp:
+            fp.write("[")
+            for i, event in enumerate(self.generate(size)):
+                if i:
+                    fp.write(",")
+                fp.write(json.dumps(event, separators=(",", ":")))
+            fp.write("]")
+        return getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start-year", type=int, default=2022)
+    parser.add_argument("--end-year", type=int, default=2023)
+    parser.add_argument("--output", default="idmc_idu.json")
+    args = parser.parse_args()
+    feed = SyntheticFeed(args.seed, args.start_year, args.end_year)
+    size = feed.write(args.output, args.events)
+    print(f"Wrote {args.events} events ({size} bytes) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
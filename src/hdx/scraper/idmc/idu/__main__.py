@@ -5,6 +5,7 @@ Top level script. Calls other functions that generate datasets that this script
 """
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from os import getenv
 from os.path import expanduser, join
 
@@ -12,29 +13,214 @@ from hdx.api.configuration import Configuration
 from hdx.data.dataset import Dataset
 from hdx.data.user import User
 from hdx.facades.infer_arguments import facade
-from hdx.utilities.dateparse import now_utc
+from hdx.utilities.dateparse import now_utc, parse_date
 from hdx.utilities.downloader import Download
-from hdx.utilities.path import (
-    progress_storing_folder,
-    script_dir_plus_file,
-    wheretostart_tempdir_batch,
-)
+from hdx.utilities.path import script_dir_plus_file, wheretostart_tempdir_batch
 from hdx.utilities.retriever import Retrieve
 
 from hdx.scraper.idmc.idu._version import __version__
+from hdx.scraper.idmc.idu.feedcache import FeedCache
+from hdx.scraper.idmc.idu.instrumentation import Instrumentation
 from hdx.scraper.idmc.idu.pipeline import Pipeline
+from hdx.scraper.idmc.idu.publisher import Publisher
+from hdx.scraper.idmc.idu.showcases import ShowcaseProbe
+from hdx.scraper.idmc.idu.stages import Stage
+from hdx.scraper.idmc.idu.state import RunState, UploadManifest
+from hdx.scraper.idmc.idu.windowed import WindowedDownload
+from hdx.scraper.idmc.idu.yearcache import YearCache
 
 logger = logging.getLogger(__name__)
 
 lookup = "hdx-scraper-idmc-idu"
 
 
-def main(save: bool = False, use_saved: bool = False) -> None:
+def create_in_hdx(dataset, showcase, batch):
+    logger.info(f"Updating {dataset['name']}")
+    dataset.create_in_hdx(
+        remove_additional_resources=True,
+        updated_by_script="HDX Scraper: IDMC IDU",
+        batch=batch,
+    )
+    if showcase:
+        showcase.create_in_hdx()
+        showcase.add_dataset(dataset)
+
+
+def get_existing_datasets():
+    # Private datasets must be found too or they are created again
+    datasets = Dataset.search_in_hdx(
+        fq="owner_org:647d9d8c-4cac-4c33-b639-649aad1c2893", include_private=True
+    )
+    logger.info(f"{len(datasets)} datasets of organisation found in HDX")
+    return {dataset["name"]: dataset for dataset in datasets}
+
+
+def delete_from_hdx(dataset):
+    for showcase in dataset.get_showcases():
+        logger.info(f"Showcase {showcase['name']} deleted")
+        showcase.delete_from_hdx()
+    logger.info(f"Dataset {dataset['name']} deleted")
+    dataset.delete_from_hdx()
+    return "deleted"
+
+
+def publish(
+    countryiso,
+    dataset,
+    showcase,
+    populated,
+    batch,
+    manifest,
+    run_state,
+    country_state,
+    instrumentation,
+    existing_datasets,
+):
+    with instrumentation.phase("publish", countryiso):
+        status = publish_country(
+            dataset, showcase, populated, batch, manifest, existing_datasets
+        )
+    if run_state:
+        run_state.update(countryiso, country_state)
+    instrumentation.count(status)
+    return status
+
+
+def publish_country(dataset, showcase, populated, batch, manifest, existing_datasets):
+    if populated:
+        status = "updated"
+        if manifest:
+            upload_hash = manifest.get_upload_hash(dataset, showcase)
+            if manifest.is_unchanged(dataset["name"], upload_hash):
+                logger.info(f"Not updating {dataset['name']} as content is unchanged")
+                status = "unchanged"
+            else:
+                create_in_hdx(dataset, showcase, batch)
+                manifest.update(dataset["name"], upload_hash)
+                manifest.save()
+        else:
+            create_in_hdx(dataset, showcase, batch)
+    else:
+        if manifest:
+            manifest.remove(dataset["name"])
+            manifest.save()
+        existing_dataset = existing_datasets.get(dataset["name"])
+        if existing_dataset:
+            status = delete_from_hdx(existing_dataset)
+        else:
+            status = "absent"
+    return status
+
+
+def prepare_countries(pipeline, countries, run_state, instrumentation):
+    """Generate the dataset and showcase of each country unless its events
+    are unchanged since the last run
+
+    Args:
+        pipeline (Pipeline): Pipeline with ingested events
+        countries (Iterable[dict]): Countries to prepare
+        run_state (RunState | None): State of last run
+        instrumentation (Instrumentation): Instrumentation
+
+    Returns:
+        Iterator[tuple]: Country, status if it is not to be published, dataset, showcase, whether populated and country state
+    """
+    for nextdict in countries:
+        countryiso = nextdict["iso3"]
+        country_state = None
+        if run_state:
+            country_state = pipeline.get_country_state(countryiso)
+            if run_state.is_unchanged(countryiso, country_state):
+                logger.info(f"Skipping {countryiso} as events are unchanged")
+                yield nextdict, "skipped", None, None, False, country_state
+                continue
+            added, updated, removed = run_state.get_changes(countryiso, country_state)
+            logger.info(
+                f"{countryiso}: {added} events added, {updated} updated, {removed} removed"
+            )
+        with instrumentation.phase("generate", countryiso):
+            dataset, showcase, populated = pipeline.generate_dataset_and_showcase(
+                countryiso
+            )
+            if populated:
+                dataset.update_from_yaml(
+                    script_dir_plus_file(
+                        join("config", "hdx_dataset_static.yaml"), Pipeline
+                    )
+                )
+                dataset["notes"] = dataset["notes"].replace(
+                    "\n", "  \n"
+                )  # ensure markdown has line breaks
+        if not dataset:
+            yield nextdict, "error", None, None, False, country_state
+            continue
+        yield nextdict, None, dataset, showcase, populated, country_state
+
+
+def search_existing_datasets(instrumentation):
+    with instrumentation.phase("hdx_search"):
+        return get_existing_datasets()
+
+
+def parse_shard(shard):
+    try:
+        shard_index, shard_count = (int(number) for number in shard.split("/"))
+    except ValueError as e:
+        raise ValueError(f"Shard {shard} must be of the form i/n!") from e
+    if not 1 <= shard_index <= shard_count:
+        raise ValueError(
+            f"Shard {shard} must be between 1/{shard_count} and {shard_count}/{shard_count}!"
+        )
+    return shard_index, shard_count
+
+
+def main(
+    save: bool = False,
+    use_saved: bool = False,
+    compress_saved: bool = False,
+    stream_feed: bool = False,
+    stream_csv: bool = False,
+    state_file: str | None = None,
+    manifest_file: str | None = None,
+    publish_workers: int = 1,
+    publish_rate: int = 0,
+    showcase_cache: str | None = None,
+    metrics_file: str | None = None,
+    feed_cache: str | None = None,
+    territories_cache: str | None = None,
+    partition_folder: str | None = None,
+    shard: str | None = None,
+    windowed_download: bool = False,
+    summary_file: str | None = None,
+    spill_threshold: int = 0,
+    history_years: int | None = None,
+    year_cache: str | None = None,
+    pipeline_queue: int = 0,
+) -> None:
     """Generate datasets and create them in HDX
 
     Args:
         save (bool): Save downloaded data. Defaults to False.
         use_saved (bool): Use saved data. Defaults to False.
+        compress_saved (bool): Save IDU feed compressed and filtered to the years used. Defaults to False.
+        stream_feed (bool): Parse IDU feed incrementally. Defaults to False.
+        stream_csv (bool): Write events to country CSVs as they are read. Defaults to False.
+        state_file (str | None): State file used to skip unchanged countries. Defaults to None.
+        manifest_file (str | None): Manifest of upload hashes used to skip unchanged uploads. Defaults to None.
+        publish_workers (int): Number of countries to publish at once. Defaults to 1.
+        publish_rate (int): Maximum countries to publish per minute. Defaults to 0 (no limit).
+        showcase_cache (str | None): Cache of showcase urls known to exist. Defaults to None.
+        metrics_file (str | None): File to which to write timings and counts. Defaults to None.
+        feed_cache (str | None): Folder in which to cache IDU feed, exiting early if unchanged. Defaults to None.
+        territories_cache (str | None): Cache of territories lookup. Defaults to None.
+        partition_folder (str | None): Folder of per country partitions shared by shards. Defaults to None.
+        shard (str | None): Shard i/n of countries to publish from partition folder. Defaults to None.
+        windowed_download (bool): Download only the events needed in concurrent date windows. Defaults to False.
+        summary_file (str | None): CSV to which to write totals of all countries. Defaults to None.
+        spill_threshold (int): Events to hold in memory before spilling to disk. Defaults to 0 (never spill).
+        history_years (int | None): Years before the current one from which to include events. Defaults to None (from configuration).
+        year_cache (str | None): Folder in which to cache cleaned events of closed years. Defaults to None.
+        pipeline_queue (int): Run download, ingest, generation and publishing as concurrent stages with queues of this size. Defaults to 0 (run in turn).
 
     Returns:
         None
@@ -45,7 +231,26 @@ def main(save: bool = False, use_saved: bool = False) -> None:
     User.check_current_user_write_access(
         "647d9d8c-4cac-4c33-b639-649aad1c2893", configuration=configuration
     )
-    with wheretostart_tempdir_batch(lookup) as info:
+    if windowed_download and feed_cache:
+        logger.warning(
+            "Ignoring windowed download as the feed cache needs the full feed!"
+        )
+        windowed_download = False
+    if shard:
+        if not partition_folder:
+            raise ValueError("A partition folder is needed to run a shard!")
+        shard_index, shard_count = parse_shard(shard)
+        metadata = Pipeline.load_partitions_metadata(partition_folder)
+        # Shards share the batch of the ingest run and keep their progress in
+        # their own folder under the partition folder
+        folder_name = f"{lookup}-shard-{shard_index}-of-{shard_count}"
+        batch = metadata["batch"]
+        tempdir = partition_folder
+    else:
+        folder_name = lookup
+        batch = None
+        tempdir = None
+    with wheretostart_tempdir_batch(folder_name, batch=batch, tempdir=tempdir) as info:
         folder = info["folder"]
         idmc_key = getenv("IDMC_KEY")
         if idmc_key:
@@ -61,49 +266,166 @@ def main(save: bool = False, use_saved: bool = False) -> None:
                 downloader, folder, "saved_data", folder, save, use_saved
             )
             batch = info["batch"]
-            today = now_utc()
-            pipeline = Pipeline(configuration, retriever, today, folder)
-            pipeline.get_idmc_territories()
-            countries = pipeline.get_countriesdata()
-            logger.info(f"Number of country datasets to upload: {len(countries)}")
-            deleted = 0
-
-            for _, nextdict in progress_storing_folder(info, countries, "iso3"):
-                countryiso = nextdict["iso3"]
-                (
-                    dataset,
-                    showcase,
-                    populated,
-                ) = pipeline.generate_dataset_and_showcase(countryiso)
-                if dataset:
-                    if populated:
-                        dataset.update_from_yaml(
-                            script_dir_plus_file(
-                                join("config", "hdx_dataset_static.yaml"), main
-                            )
+            if shard:
+                today = parse_date(metadata["today"])
+            else:
+                today = now_utc()
+            instrumentation = Instrumentation()
+            try:
+                if feed_cache:
+                    feed = FeedCache(feed_cache)
+                else:
+                    feed = None
+                if windowed_download:
+                    windowed_configuration = configuration["windowed_download"]
+                    windowed = WindowedDownload(
+                        downloader.session,
+                        windowed_configuration["url"],
+                        windowed_configuration["start_parameter"],
+                        windowed_configuration["end_parameter"],
+                        months=windowed_configuration["months"],
+                        max_workers=windowed_configuration["workers"],
+                        timeout=windowed_configuration["timeout"],
+                    )
+                else:
+                    windowed = None
+                if history_years is None:
+                    history_years = configuration["history_years"]
+                if year_cache:
+                    year_cache = YearCache(year_cache)
+                pipeline = Pipeline(
+                    configuration,
+                    retriever,
+                    today,
+                    folder,
+                    stream=stream_feed,
+                    instrumentation=instrumentation,
+                    feed_cache=feed,
+                    compress_saved=compress_saved,
+                    territories_cache=territories_cache,
+                    # Partitions are saved from events held in memory
+                    stream_csv=stream_csv and (shard or not partition_folder),
+                    windowed=windowed,
+                    spill_threshold=spill_threshold,
+                    history_years=history_years,
+                    year_cache=year_cache,
+                    queue_size=pipeline_queue,
+                )
+                if feed and not shard and not pipeline.fetch_feed():
+                    logger.info(
+                        "IDU feed unchanged since last completed run so exiting"
+                    )
+                    feed.commit()
+                    return
+                if pipeline_queue and (shard or not partition_folder):
+                    # Search HDX for existing datasets while the feed is ingested
+                    executor = ThreadPoolExecutor(max_workers=1)
+                    search = executor.submit(search_existing_datasets, instrumentation)
+                    executor.shutdown(wait=False)
+                else:
+                    search = None
+                if shard:
+                    with instrumentation.phase("load_partitions"):
+                        countries = pipeline.load_partitions(
+                            partition_folder, shard_index, shard_count
                         )
-                        dataset["notes"] = dataset["notes"].replace(
-                            "\n", "  \n"
-                        )  # ensure markdown has line breaks
-                        logger.info(f"Updating {dataset['name']}")
-                        dataset.create_in_hdx(
-                            remove_additional_resources=True,
-                            updated_by_script="HDX Scraper: IDMC IDU",
-                            batch=batch,
+                else:
+                    with instrumentation.phase("territories"):
+                        pipeline.get_idmc_territories()
+                    with instrumentation.phase("ingest"):
+                        countries = pipeline.get_countriesdata()
+                if summary_file:
+                    pipeline.summaries.write_global(summary_file)
+                if partition_folder and not shard:
+                    with instrumentation.phase("save_partitions"):
+                        pipeline.save_partitions(partition_folder, batch)
+                    if feed:
+                        feed.commit()
+                    return
+                probe_configuration = configuration["showcase_probe"]
+                with instrumentation.phase("showcase_probe"):
+                    pipeline.probe_showcase_urls(
+                        ShowcaseProbe(
+                            showcase_cache,
+                            ttl_days=probe_configuration["ttl_days"],
+                            max_workers=probe_configuration["workers"],
+                            timeout=probe_configuration["timeout"],
+                        ),
+                        [country["iso3"] for country in countries],
+                    )
+                logger.info(f"Number of country datasets to upload: {len(countries)}")
+                if state_file:
+                    run_state = RunState(state_file)
+                else:
+                    run_state = None
+                if manifest_file:
+                    manifest = UploadManifest(manifest_file)
+                else:
+                    manifest = None
+
+                if search:
+                    existing_datasets = search.result()
+                else:
+                    existing_datasets = search_existing_datasets(instrumentation)
+                publisher = Publisher(
+                    info, "iso3", max_workers=publish_workers, per_minute=publish_rate
+                )
+                try:
+                    prepared = prepare_countries(
+                        pipeline,
+                        publisher.iterate(countries, wait=not pipeline_queue),
+                        run_state,
+                        instrumentation,
+                    )
+                    if pipeline_queue:
+                        # Generate datasets in a background thread while publishing
+                        prepared = Stage("generate", prepared, pipeline_queue)
+                    for (
+                        nextdict,
+                        status,
+                        dataset,
+                        showcase,
+                        populated,
+                        country_state,
+                    ) in prepared:
+                        if status:
+                            publisher.skip(nextdict, status)
+                            instrumentation.count(status)
+                            continue
+                        if pipeline_queue:
+                            publisher.wait_for_worker()
+                        publisher.submit(
+                            nextdict,
+                            publish,
+                            nextdict["iso3"],
+                            dataset,
+                            showcase,
+                            populated,
+                            batch,
+                            manifest,
+                            run_state,
+                            country_state,
+                            instrumentation,
+                            existing_datasets,
                         )
-                        if showcase:
-                            showcase.create_in_hdx()
-                            showcase.add_dataset(dataset)
-                    else:
-                        dataset = Dataset.read_from_hdx(dataset["name"])
-                        if dataset:
-                            for showcase in dataset.get_showcases():
-                                logger.info(f"Showcase {showcase['name']} deleted")
-                                showcase.delete_from_hdx()
-                            logger.info(f"Dataset {dataset['name']} deleted")
-                            deleted += 1
-                            dataset.delete_from_hdx()
-            logger.info(f"{deleted} datasets deleted")
+                    statuses = publisher.wait()
+                finally:
+                    # The state is saved in batches so save the remainder, even if
+                    # publishing failed, to keep the progress made
+                    if run_state:
+                        run_state.save()
+                logger.info(f"{statuses['deleted']} datasets deleted")
+                if run_state:
+                    logger.info(f"{statuses['skipped']} countries skipped as unchanged")
+                if manifest:
+                    logger.info(f"{statuses['unchanged']} uploads skipped as unchanged")
+                if feed:
+                    feed.commit()
+            finally:
+                # Failed runs are measured too
+                instrumentation.log_summary()
+                if metrics_file:
+                    instrumentation.save(metrics_file)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+"""
+Popup text cleaner:
+-------------------
+
+Converts the standard popup HTML of IDU events into a plain text description
+and a link. Tag stripping and whitespace collapsing are done in one compiled
+pass and results are memoized as many events share the same popup text.
+
+"""
+
+import re
+from functools import lru_cache
+
+
+class PopupCleaner:
+    regex_popup = re.compile(r"(.*)<a href=\\?\"(.*)\\?\"target")
+    # A run of spaces, tabs, <br> and <b> collapses to a single space if it
+    # contains any whitespace and to nothing otherwise. </b> ends a sentence.
+    # Single spaces are left alone so that most words need no substitution
+    # and the lookahead skips other characters quickly.
+    regex_text = re.compile(r"(?=[ \t<])(?:(?:[ \t]|<br?>){2,}|\t|<br?>|</b>)")
+
+    def __init__(self, maxsize=8192):
+        self.clean_popup = lru_cache(maxsize=maxsize)(self.clean_popup_text)
+
+    @staticmethod
+    def replace_text(match):
+        text = match.group(0)
+        if text == "</b>":
+            return "."
+        if " " in text or "\t" in text:
+            return " "
+        return ""
+
+    def clean_popup_text(self, popup):
+        """Get description and link from popup text
+
+        Args:
+            popup (str): Standard popup text of event
+
+        Returns:
+            tuple[str, str | None]: Description and link
+        """
+        popup = popup.replace("\n", " ")
+        match = self.regex_popup.match(popup)
+        if match:
+            text, link = match.groups()
+        else:
+            text = popup
+            link = None
+        text = self.regex_text.sub(self.replace_text, text)
+        return text.replace(" .", ".").strip(), link
+
+    def clean_event(self, event):
+        event["description"], event["link"] = self.clean_popup(
+            event.pop("standard_popup_text")
+        )
+        del event["standard_info_text"]
+        return event
+
+    def clean_events(self, events):
+        """Clean the popup text of events in place
+
+        Args:
+            events (Iterable[dict]): Events to clean
+
+        Returns:
+            Iterator[dict]: Cleaned events
+        """
+        for event in events:
+            yield self.clean_event(event)
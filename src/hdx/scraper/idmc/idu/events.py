@@ -0,0 +1,328 @@
+#!/usr/bin/python
+"""
+Event store:
+------------
+
+Holds cleaned IDU events compactly as tuples per country, keeping only the
+output columns and interning the values of categorical columns which repeat
+across many events. Events can be spilled to per country JSON Lines files
+once too many are held in memory or written straight to per country CSVs
+keeping only what is needed to track changes. Rows are put in a fixed order
+once all events are added so that the output does not depend on the order in
+which events arrive.
+
+"""
+
+import csv
+from hashlib import sha256
+from json import dumps, loads
+from operator import itemgetter
+from os import makedirs, replace
+from os.path import join
+from sys import intern
+
+# Rows are sorted newest first by these columns
+sort_headers = ("displacement_start_date", "id")
+
+
+def update_fingerprint(fingerprint, row):
+    """Add the hash of a row to a fingerprint. Hashes are summed so that the
+    fingerprint does not depend on the order of rows.
+
+    Args:
+        fingerprint (int): Fingerprint of previous rows
+        row (Sequence): Row
+
+    Returns:
+        int: Fingerprint including row
+    """
+    digest = sha256(dumps(list(row), default=str).encode("utf-8")).digest()
+    return (fingerprint + int.from_bytes(digest, "big")) % 2**256
+
+
+def get_sort_key(indices):
+    if any(header not in indices for header in sort_headers):
+        return None
+    return itemgetter(*(indices[header] for header in sort_headers))
+
+
+class EventStore:
+    categorical = (
+        "country",
+        "iso3",
+        "centroid",
+        "displacement_type",
+        "qualifier",
+        "category",
+        "subcategory",
+        "type",
+        "subtype",
+        "combined_type",
+    )
+
+    def __init__(self):
+        self.headers = None
+        self.indices = {}
+        self.categorical_indices = ()
+        self.sort_key = None
+        self.rows = {}
+
+    def set_headers(self, headers):
+        self.headers = list(headers)
+        self.indices = {header: i for i, header in enumerate(self.headers)}
+        self.categorical_indices = frozenset(
+            self.indices[header]
+            for header in self.categorical
+            if header in self.indices
+        )
+        self.sort_key = get_sort_key(self.indices)
+
+    def add(self, countryiso, event):
+        """Add an event for a country. The first event added sets the headers.
+
+        Args:
+            countryiso (str): Country ISO3 code
+            event (dict): Cleaned event
+
+        Returns:
+            None
+        """
+        if self.headers is None:
+            self.set_headers(event.keys())
+        row = []
+        for i, header in enumerate(self.headers):
+            value = event[header]
+            if i in self.categorical_indices and isinstance(value, str):
+                value = intern(value)
+            row.append(value)
+        rows = self.rows.get(countryiso)
+        if rows is None:
+            rows = self.rows[countryiso] = []
+        rows.append(tuple(row))
+
+    def get_rows(self, countryiso):
+        return self.rows.get(countryiso, [])
+
+    def close(self):
+        """Sort the rows of each country once all events are added
+
+        Returns:
+            None
+        """
+        if self.sort_key is None:
+            return
+        for rows in self.rows.values():
+            rows.sort(key=self.sort_key, reverse=True)
+
+    def get_country_state(self, countryiso):
+        """Get ids and creation dates of events of a country and a fingerprint
+        of their content
+
+        Args:
+            countryiso (str): Country ISO3 code
+
+        Returns:
+            dict: Events by id and fingerprint
+        """
+        events = {}
+        fingerprint = 0
+        if countryiso not in self:
+            return {"events": events, "fingerprint": f"{fingerprint:064x}"}
+        id_index = self.indices["id"]
+        created_at_index = self.indices["created_at"]
+        for row in self.get_rows(countryiso):
+            events[str(row[id_index])] = row[created_at_index]
+            fingerprint = update_fingerprint(fingerprint, row)
+        return {"events": events, "fingerprint": f"{fingerprint:064x}"}
+
+    def __contains__(self, countryiso):
+        return countryiso in self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class SpillingEventStore(EventStore):
+    def __init__(self, folder, max_rows):
+        super().__init__()
+        self.folder = folder
+        self.max_rows = max_rows
+        self.rows_in_memory = 0
+        self.spilled = {}
+
+    def add(self, countryiso, event):
+        super().add(countryiso, event)
+        self.rows_in_memory += 1
+        if self.rows_in_memory >= self.max_rows:
+            self.spill()
+
+    def spill(self):
+        """Append the rows held in memory to the JSON Lines file of each
+        country and release them
+
+        Returns:
+            None
+        """
+        makedirs(self.folder, exist_ok=True)
+        for countryiso, rows in self.rows.items():
+            path = self.spilled.get(countryiso)
+            if path is None:
+                path = self.spilled[countryiso] = join(
+                    self.folder, f"{countryiso}.jsonl"
+                )
+                # Overwrite any file left by an earlier run in the same folder
+                mode = "w"
+            else:
+                mode = "a"
+            with open(path, mode, encoding="utf-8") as fp:
+                for row in rows:
+                    fp.write(dumps(row, separators=(",", ":")))
+                    fp.write("\n")
+        self.rows = {}
+        self.rows_in_memory = 0
+
+    def iterate_rows(self, path, countryiso):
+        with open(path, encoding="utf-8") as fp:
+            for line in fp:
+                yield tuple(loads(line))
+        yield from self.rows.get(countryiso, [])
+
+    def get_rows(self, countryiso):
+        """Get rows of a country. Spilled rows are read back from disk when
+        requested, so only one spilled country is held in memory at a time.
+
+        Args:
+            countryiso (str): Country ISO3 code
+
+        Returns:
+            Iterable[tuple]: Rows of country
+        """
+        path = self.spilled.get(countryiso)
+        if path is None:
+            return super().get_rows(countryiso)
+        rows = self.iterate_rows(path, countryiso)
+        if self.sort_key is None:
+            return rows
+        return sorted(rows, key=self.sort_key, reverse=True)
+
+    def get_countryisos(self):
+        return dict.fromkeys((*self.spilled, *self.rows))
+
+    def __contains__(self, countryiso):
+        return countryiso in self.rows or countryiso in self.spilled
+
+    def __iter__(self):
+        return iter(self.get_countryisos())
+
+    def __len__(self):
+        return len(self.get_countryisos())
+
+
+class EventWriter:
+    def __init__(self, folder, get_filename, buffer_size=65536):
+        self.folder = folder
+        self.get_filename = get_filename
+        self.buffer_size = buffer_size
+        self.headers = None
+        self.files = {}
+        self.writers = {}
+        self.row_counts = {}
+        self.events = {}
+        self.fingerprints = {}
+
+    def get_path(self, countryiso):
+        return join(self.folder, self.get_filename(countryiso))
+
+    def open(self, countryiso):
+        fp = open(
+            self.get_path(countryiso),
+            "w",
+            encoding="utf-8",
+            newline="",
+            buffering=self.buffer_size,
+        )
+        self.files[countryiso] = fp
+        writer = self.writers[countryiso] = csv.writer(fp, lineterminator="\n")
+        writer.writerow(self.headers)
+        self.row_counts[countryiso] = 0
+        self.events[countryiso] = {}
+        self.fingerprints[countryiso] = 0
+        return writer
+
+    def add(self, countryiso, event):
+        """Write an event to the CSV of a country. The first event added sets
+        the headers.
+
+        Args:
+            countryiso (str): Country ISO3 code
+            event (dict): Cleaned event
+
+        Returns:
+            None
+        """
+        if self.headers is None:
+            self.headers = list(event.keys())
+        writer = self.writers.get(countryiso)
+        if writer is None:
+            writer = self.open(countryiso)
+        row = [event[header] for header in self.headers]
+        writer.writerow(row)
+        self.row_counts[countryiso] += 1
+        self.events[countryiso][str(event["id"])] = event["created_at"]
+        self.fingerprints[countryiso] = update_fingerprint(
+            self.fingerprints[countryiso], row
+        )
+
+    def sort_file(self, countryiso):
+        start_date_index = self.headers.index("displacement_start_date")
+        id_index = self.headers.index("id")
+
+        def sort_key(row):
+            # Values are read back as strings so ids are compared as numbers
+            return row[start_date_index], int(row[id_index])
+
+        path = self.get_path(countryiso)
+        with open(path, encoding="utf-8", newline="") as fp:
+            reader = csv.reader(fp)
+            headers = next(reader)
+            rows = sorted(reader, key=sort_key, reverse=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8", newline="") as fp:
+            writer = csv.writer(fp, lineterminator="\n")
+            writer.writerow(headers)
+            writer.writerows(rows)
+        replace(temp_path, path)
+
+    def close(self):
+        """Close the CSV of each country and sort its rows, holding one
+        country's rows in memory at a time
+
+        Returns:
+            None
+        """
+        for countryiso, fp in self.files.items():
+            fp.close()
+            self.sort_file(countryiso)
+        self.files = {}
+
+    def get_row_count(self, countryiso):
+        return self.row_counts.get(countryiso, 0)
+
+    def get_country_state(self, countryiso):
+        fingerprint = self.fingerprints.get(countryiso, 0)
+        return {
+            "events": self.events.get(countryiso, {}),
+            "fingerprint": f"{fingerprint:064x}",
+        }
+
+    def __contains__(self, countryiso):
+        return countryiso in self.writers
+
+    def __iter__(self):
+        return iter(self.writers)
+
+    def __len__(self):
+        return len(self.writers)
@@ -0,0 +1,119 @@
+#!/usr/bin/python
+"""
+IDU feed cache:
+---------------
+
+Keeps the last IDU feed on disk with its validators (ETag, Last-Modified and a
+content hash) and fetches the feed with a conditional request, reusing the
+cached body when the server answers 304 Not Modified or returns the same
+content. The minimum date and configuration key of the run are kept with the
+validators so that the feed is treated as changed when either differs.
+Validators are only committed once the batch completes so that an interrupted
+run fetches the feed again.
+
+"""
+
+import logging
+from hashlib import sha256
+from os import makedirs, remove, replace
+from os.path import exists, join
+
+from hdx.utilities.loader import load_json
+
+from hdx.scraper.idmc.idu.state import save_state
+
+logger = logging.getLogger(__name__)
+
+
+class FeedCache:
+    chunk_size = 1024 * 1024
+
+    def __init__(self, folder, filename="idmc_idu.json"):
+        makedirs(folder, exist_ok=True)
+        self.path = join(folder, filename)
+        self.pending_path = f"{self.path}.tmp"
+        self.validators_path = join(folder, "validators.json")
+        if exists(self.validators_path) and exists(self.path):
+            self.validators = load_json(self.validators_path)
+        else:
+            self.validators = {}
+        self.pending = None
+
+    def get_request_headers(self):
+        headers = {}
+        etag = self.validators.get("etag")
+        if etag:
+            headers["If-None-Match"] = etag
+        last_modified = self.validators.get("last_modified")
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def fetch(self, downloader, url, min_date=None, config_key=None):
+        """Fetch feed sending a conditional request if it has been fetched
+        before. The feed is only reported as unchanged if the minimum date and
+        configuration key are also the same as when it was last committed.
+
+        Args:
+            downloader (Download): Download object
+            url (str): Url of feed
+            min_date (str | None): Minimum date of events used. Defaults to None.
+            config_key (str | None): Key of configuration used. Defaults to None.
+
+        Returns:
+            tuple[str, bool]: Path of feed and whether it or the run changed
+        """
+        run = {"min_date": min_date, "config_key": config_key}
+        response = downloader.setup(url, headers=self.get_request_headers())
+        if response.status_code == 304:
+            response.close()
+            logger.info(f"IDU feed not modified, using cached {self.path}")
+            if exists(self.pending_path):
+                remove(self.pending_path)
+            path = self.path
+            changed = False
+            validators = self.validators | run
+        else:
+            content_hash = sha256()
+            with open(self.pending_path, "wb") as fp:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    content_hash.update(chunk)
+                    fp.write(chunk)
+            validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "sha256": content_hash.hexdigest(),
+            } | run
+            if validators["sha256"] == self.validators.get("sha256"):
+                remove(self.pending_path)
+                logger.info(f"IDU feed content unchanged, using cached {self.path}")
+                path = self.path
+                changed = False
+            else:
+                path = self.pending_path
+                changed = True
+        # Keep any new validators so the next request can be conditional
+        self.pending = validators
+        if not changed and any(
+            self.validators.get(key) != value for key, value in run.items()
+        ):
+            logger.info(
+                "IDU feed unchanged but history window or configuration changed"
+            )
+            changed = True
+        return path, changed
+
+    def commit(self):
+        """Make the last fetched feed the cached one. Call once the batch has
+        completed.
+
+        Returns:
+            None
+        """
+        if self.pending is None:
+            return
+        if exists(self.pending_path):
+            replace(self.pending_path, self.path)
+        self.validators = self.pending
+        self.pending = None
+        save_state(self.validators, self.validators_path)
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+"""
+Instrumentation:
+----------------
+
+Records wall time per phase and per country, counters such as events and
+bytes, and peak RSS. Recording only uses a clock read, a few dictionary
+updates and a lock per phase so it is cheap enough to leave on in production.
+
+"""
+
+import logging
+from contextlib import contextmanager
+from resource import RUSAGE_SELF, getrusage
+from threading import Lock
+from time import perf_counter
+
+from hdx.utilities.dateparse import now_utc
+
+from hdx.scraper.idmc.idu.state import save_state
+
+logger = logging.getLogger(__name__)
+
+
+def get_max_rss_kb():
+    return getrusage(RUSAGE_SELF).ru_maxrss
+
+
+class Instrumentation:
+    def __init__(self):
+        self.started_at = now_utc()
+        self.start = perf_counter()
+        self.phases = {}
+        self.counters = {}
+        self.countries = {}
+        self.lock = Lock()
+
+    def add_time(self, name, seconds, countryiso=None):
+        with self.lock:
+            phase = self.phases.get(name)
+            if phase is None:
+                phase = self.phases[name] = {
+                    "calls": 0,
+                    "seconds": 0.0,
+                    "max_seconds": 0.0,
+                }
+            phase["calls"] += 1
+            phase["seconds"] += seconds
+            if seconds > phase["max_seconds"]:
+                phase["max_seconds"] = seconds
+            phase["max_rss_kb"] = get_max_rss_kb()
+            if countryiso:
+                country = self.countries.setdefault(countryiso, {})
+                country[name] = country.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name, countryiso=None):
+        """Time a phase, optionally for a country
+
+        Args:
+            name (str): Name of phase
+            countryiso (str | None): Country ISO3 code. Defaults to None.
+
+        Returns:
+            None
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, perf_counter() - start, countryiso)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def get_summary(self):
+        with self.lock:
+            phases = {
+                name: {
+                    key: round(value, 4) if isinstance(value, float) else value
+                    for key, value in phase.items()
+                }
+                for name, phase in self.phases.items()
+            }
+            countries = {
+                countryiso: {name: round(seconds, 4) for name, seconds in phase.items()}
+                for countryiso, phase in sorted(self.countries.items())
+            }
+            return {
+                "started_at": self.started_at.isoformat(),
+                "seconds": round(perf_counter() - self.start, 4),
+                "max_rss_kb": get_max_rss_kb(),
+                "phases": phases,
+                "counters": dict(self.counters),
+                "countries": countries,
+            }
+
+    def log_summary(self):
+        summary = self.get_summary()
+        for name, phase in summary["phases"].items():
+            logger.info(
+                f"{name}: {phase['seconds']}s over {phase['calls']} calls (max {phase['max_seconds']}s)"
+            )
+        for name, value in summary["counters"].items():
+            logger.info(f"{name}: {value}")
+        logger.info(f"Total {summary['seconds']}s, peak RSS {summary['max_rss_kb']} KB")
+        return summary
+
+    def save(self, path):
+        save_state(self.get_summary(), path)
@@ -8,129 +8,471 @@ Reads IDMC csvs and creates datasets.
 """
 
 import logging
-import re
-from os.path import join
+from copy import copy
+from hashlib import sha256
+from json import dumps, loads
+from os import makedirs
+from os.path import exists, getsize, join
+from shutil import copyfile
+from time import perf_counter
 
+import ijson
 from hdx.data.dataset import Dataset
 from hdx.data.hdxobject import HDXError
+from hdx.data.resource import Resource
 from hdx.data.showcase import Showcase
 from hdx.location.country import Country
-from hdx.utilities.dictandlist import dict_of_lists_add
 from hdx.utilities.downloader import DownloadError
-from hdx.utilities.matching import multiple_replace
+from hdx.utilities.loader import load_json
 from hdx.utilities.path import script_dir_plus_file
+from hdx.utilities.saver import save_json
+from requests import RequestException
 from slugify import slugify
 
+from hdx.scraper.idmc.idu.cleaner import PopupCleaner
+from hdx.scraper.idmc.idu.events import EventStore, EventWriter, SpillingEventStore
+from hdx.scraper.idmc.idu.instrumentation import Instrumentation
+from hdx.scraper.idmc.idu.savedfeed import (
+    read_saved_events,
+    saved_filename,
+    write_saved_events,
+)
+from hdx.scraper.idmc.idu.stages import Stage
+from hdx.scraper.idmc.idu.state import save_state
+from hdx.scraper.idmc.idu.summary import SummaryIndex
+from hdx.scraper.idmc.idu.territories import TerritoryLookup
+
 logger = logging.getLogger(__name__)
 
 
 class Pipeline:
-    regex_popup = re.compile(r"(.*)<a href=\\?\"(.*)\\?\"target")
-
-    def __init__(self, configuration, retriever, today, folder):
+    def __init__(
+        self,
+        configuration,
+        retriever,
+        today,
+        folder,
+        stream=False,
+        instrumentation=None,
+        feed_cache=None,
+        compress_saved=False,
+        territories_cache=None,
+        stream_csv=False,
+        windowed=None,
+        spill_threshold=0,
+        history_years=1,
+        year_cache=None,
+        queue_size=0,
+    ):
         self.configuration = configuration
+        if compress_saved and retriever.save:
+            # The feed is saved compressed rather than as raw JSON
+            self.saved_path = join(retriever.saved_dir, saved_filename)
+            retriever = copy(retriever)
+            retriever.save = False
+        else:
+            self.saved_path = None
         self.retriever = retriever
         self.today = today
         self.folder = folder
-        self.events = {}
+        self.stream = stream
+        self.stream_csv = stream_csv
+        if stream_csv:
+            self.events = EventWriter(folder, self.get_filename)
+        elif spill_threshold:
+            self.events = SpillingEventStore(join(folder, "events"), spill_threshold)
+        else:
+            self.events = EventStore()
         self.countrynamemapping = {}
         self.countrystartdate = {}
         self.countryenddate = {}
+        self.countrysubtypes = {}
+        self.summaries = SummaryIndex()
         self.idmc_territories = set()
         self.headers = None
+        self.showcase_urls = {}
+        self.cleaner = PopupCleaner()
+        if instrumentation is None:
+            instrumentation = Instrumentation()
+        self.instrumentation = instrumentation
+        self.feed_cache = feed_cache
+        self.feed_path = None
+        self.feed_changed = True
+        self.territories_cache = territories_cache
+        self.windowed = windowed
+        self.history_years = history_years
+        self.year_cache = year_cache
+        self.cached_years = set()
+        self.queue_size = queue_size
+        self.metadata_key = None
 
     def get_idmc_territories(self):
-        headers, iterator = self.retriever.downloader.get_tabular_rows(
+        lookup = TerritoryLookup.load(
+            self.retriever.downloader,
             script_dir_plus_file(join("config", "IDMC_territories.csv"), Pipeline),
-            dict_form=True,
+            self.territories_cache,
         )
-        unknown_countryisos = set()
-        high_income_countries = set()
-        for row in iterator:
-            countryiso = row["iso3"]
-            countryinfo = Country.get_country_info_from_iso3(countryiso)
-            if not countryinfo:
-                unknown_countryisos.add(countryiso)
-                continue
-            countryname = row["idmc_short_name"]
-            income_level = countryinfo["World Bank Income Level"] or ""
-            if income_level.lower() == "high":
-                high_income_countries.add(countryname)
-                continue
-            self.idmc_territories.add(row["iso3"])
-        unknown_countryisos = ",".join(unknown_countryisos)
+        self.idmc_territories = lookup
+        unknown_countryisos = ",".join(lookup.unknown_countryisos)
         logger.warning(f"Ignoring unknown country isos: {unknown_countryisos}")
+        high_income_countries = set(lookup.high_income_countries)
         logger.info(f"Ignoring high income countries {high_income_countries}!")
 
-    def get_countriesdata(self):
+    def fetch_feed(self):
+        """Fetch IDU feed into the feed cache if not already fetched
+
+        Returns:
+            bool: Whether feed, history window or configuration changed since feed was last cached
+        """
+        if self.feed_path:
+            return self.feed_changed
         url = self.configuration["url"]
-        json = self.retriever.download_json(url, "idmc_idu.json")
-        min_date = f"{self.today.year - 1}-01-01"
-        for event in json:
-            countryiso = event["iso3"]
-            if countryiso not in self.idmc_territories:
-                continue
-            end_date = event["displacement_end_date"]
-            if end_date < min_date:
-                continue
-            start_date = event["displacement_start_date"]
-            min_start_date = self.countrystartdate.get(countryiso)
-            if min_start_date:
-                if start_date < min_start_date:
-                    self.countrystartdate[countryiso] = start_date
+        with self.instrumentation.phase("download"):
+            if self.retriever.use_saved:
+                self.feed_path = self.retriever.download_file(url, "idmc_idu.json")
+                self.feed_changed = True
             else:
-                self.countrystartdate[countryiso] = start_date
-            max_end_date = self.countryenddate.get(countryiso)
-            if max_end_date:
-                if end_date > max_end_date:
-                    self.countryenddate[countryiso] = end_date
-            else:
-                self.countryenddate[countryiso] = end_date
-            self.countrynamemapping[countryiso] = event["country"]
+                self.feed_path, self.feed_changed = self.feed_cache.fetch(
+                    self.retriever.downloader,
+                    url,
+                    self.get_min_date(),
+                    self.get_metadata_key(),
+                )
+                if self.retriever.save:
+                    copyfile(
+                        self.feed_path, join(self.retriever.saved_dir, "idmc_idu.json")
+                    )
+        return self.feed_changed
+
+    def download_windows(self):
+        with self.instrumentation.phase("download"):
+            try:
+                events = self.windowed.download(
+                    self.get_download_min_date(), self.today
+                )
+            except (RequestException, ValueError, KeyError):
+                logger.exception("Windowed download failed so downloading full feed!")
+                return None
+        if self.retriever.save:
+            save_json(events, join(self.retriever.saved_dir, "idmc_idu.json"))
+        return events
+
+    def download_events(self):
+        url = self.configuration["url"]
+        # The feed cache needs the full feed to compare with the cached one
+        if self.windowed and not self.feed_cache and not self.retriever.use_saved:
+            events = self.download_windows()
+            if events is not None:
+                yield from events
+                return
+        if self.feed_cache:
+            self.fetch_feed()
+            path = self.feed_path
+        else:
+            with self.instrumentation.phase("download"):
+                path = self.retriever.download_file(url, "idmc_idu.json")
+        self.instrumentation.count("feed_bytes", getsize(path))
+        if not self.stream:
+            with self.instrumentation.phase("parse"):
+                events = load_json(path)
+            yield from events
+            return
+        # Parse the JSON array incrementally so that only retained events are
+        # held in memory rather than the whole feed
+        with open(path, "rb") as fp:
+            yield from ijson.items(fp, "item", use_float=True)
 
-        for event in json:
+    def get_events(self):
+        if self.retriever.use_saved:
+            saved_path = join(self.retriever.saved_dir, saved_filename)
+            if exists(saved_path):
+                yield from read_saved_events(
+                    saved_path, self.stream, self.get_min_date()
+                )
+                return
+        events = self.download_events()
+        if self.saved_path:
+            events = write_saved_events(events, self.saved_path, self.get_min_date())
+        yield from events
+
+    def get_min_year(self):
+        return self.today.year - self.history_years
+
+    def get_min_date(self):
+        return f"{self.get_min_year()}-01-01"
+
+    def get_download_min_date(self):
+        # A saved feed must have all years so that it can be replayed without
+        # the year cache
+        if self.retriever and self.retriever.save:
+            return self.get_min_date()
+        # Leading closed years which are cached do not need to be downloaded
+        min_year = self.get_min_year()
+        while min_year < self.today.year - 1 and str(min_year) in self.cached_years:
+            min_year += 1
+        return f"{min_year}-01-01"
+
+    def clean_event(self, event):
+        self.cleaner.clean_event(event)
+        event_type = event["type"]
+        if event_type:
+            event["combined_type"] = event_type
+        else:
+            event["combined_type"] = event["displacement_type"]
+
+    def add_event(self, countryiso, event):
+        start_date = event["displacement_start_date"]
+        min_start_date = self.countrystartdate.get(countryiso)
+        if min_start_date is None or start_date < min_start_date:
+            self.countrystartdate[countryiso] = start_date
+        end_date = event["displacement_end_date"]
+        max_end_date = self.countryenddate.get(countryiso)
+        if max_end_date is None or end_date > max_end_date:
+            self.countryenddate[countryiso] = end_date
+        self.countrynamemapping[countryiso] = event["country"]
+        subtype = event["subtype"]
+        if subtype is None:
+            subtype = event["displacement_type"]
+        subtypes = self.countrysubtypes.get(countryiso)
+        if subtypes is None:
+            subtypes = self.countrysubtypes[countryiso] = set()
+        subtypes.add(subtype)
+        self.summaries.add(countryiso, event)
+        self.events.add(countryiso, event)
+
+    def aggregate_events(self, events, min_date):
+        """Clean events from min_date and aggregate them by country. With a
+        year cache, events of cached closed years (before last year) are added
+        from the cache first and skipped in the feed. Events ending in closed
+        years which are not cached are also written to the cache.
+
+        Args:
+            events (Iterable[dict]): Events
+            min_date (str): Minimum end date in the form YYYY-MM-DD
+
+        Returns:
+            None
+        """
+        read = 0
+        retained = 0
+        cached = 0
+        clean_seconds = 0.0
+        year_cache = self.year_cache
+        if year_cache:
+            open_date = f"{self.today.year - 1}-01-01"
+            closed_years = [
+                str(year) for year in range(int(min_date[:4]), self.today.year - 1)
+            ]
+            # Set before the events are iterated so that a windowed download
+            # can leave out cached years
+            cached_years = self.cached_years = year_cache.get_years(
+                year_cache.get_key(self.idmc_territories)
+            )
+            missing_years = [year for year in closed_years if year not in cached_years]
+            for year in closed_years:
+                if year not in cached_years:
+                    continue
+                for event in year_cache.read(year):
+                    self.add_event(event["iso3"], event)
+                    cached += 1
+            retained = cached
+        else:
+            open_date = None
+        for event in events:
+            read += 1
             countryiso = event["iso3"]
-            if countryiso not in self.countrynamemapping:
+            if countryiso not in self.idmc_territories:
                 continue
             end_date = event["displacement_end_date"]
             if end_date < min_date:
                 continue
-            popup = event["standard_popup_text"].replace("\n", " ")
-            match = self.regex_popup.match(popup)
-            if match:
-                text, link = match.groups()
-            else:
-                text = popup
-                link = None
-            text = multiple_replace(
-                text, {"<br>": "", "<b>": "", "</b>": ".", "\t": " "}
-            )
-            text = re.sub(" +", " ", text)
-            event["description"] = text.replace(" .", ".").strip()
-            event["link"] = link
-            del event["standard_popup_text"]
-            del event["standard_info_text"]
-            event_type = event["type"]
-            if event_type:
-                event["combined_type"] = event_type
+            if open_date and end_date < open_date:
+                year = end_date[:4]
+                if year in cached_years:
+                    continue
             else:
-                event["combined_type"] = event["displacement_type"]
-            dict_of_lists_add(self.events, countryiso, event)
-        countries_with_events = set(self.events)
-        if len(countries_with_events) == 0:
+                year = None
+            start = perf_counter()
+            self.clean_event(event)
+            clean_seconds += perf_counter() - start
+            if year:
+                year_cache.add(year, event)
+            self.add_event(countryiso, event)
+            retained += 1
+        if open_date:
+            year_cache.commit(missing_years)
+        instrumentation = self.instrumentation
+        instrumentation.add_time("clean", clean_seconds)
+        instrumentation.count("events_read", read)
+        instrumentation.count("events_retained", retained)
+        if year_cache:
+            instrumentation.count("events_cached", cached)
+
+    def get_countriesdata(self):
+        min_date = self.get_min_date()
+        events = self.get_events()
+        if self.queue_size:
+            # Download and parse the feed in a background thread while events
+            # are cleaned, handing them over in batches to limit the overhead
+            events = Stage("download", events, self.queue_size, batch_size=1000)
+        with self.instrumentation.phase("aggregate"):
+            self.aggregate_events(events, min_date)
+        # Rows are sorted so that they do not depend on which years came from
+        # the year cache
+        self.events.close()
+        cache_info = self.cleaner.clean_popup.cache_info()
+        self.instrumentation.count("cleaner_cache_hits", cache_info.hits)
+        self.instrumentation.count("cleaner_cache_misses", cache_info.misses)
+        if len(self.events) == 0:
             raise ValueError(
                 f"No countries with events since {min_date} which is highly improbable!"
             )
-        first_list = next(iter(self.events.values()))
-        self.headers = list(first_list[0].keys())
+        self.headers = self.events.headers
 
         return [{"iso3": countryiso} for countryiso in sorted(self.idmc_territories)]
 
+    def save_partitions(self, folder, batch):
+        """Save aggregated events as one JSON Lines file per country with the
+        metadata needed to generate datasets so that shards can publish
+        without reading the feed. The metadata is written last so that shards
+        only ever see a complete intermediate.
+
+        Args:
+            folder (str): Folder in which to save partitions
+            batch (str): HDX batch id shared by all shards
+
+        Returns:
+            None
+        """
+        partitions_folder = join(folder, "partitions")
+        makedirs(partitions_folder, exist_ok=True)
+        for countryiso in self.events:
+            with open(
+                join(partitions_folder, f"{countryiso}.jsonl"), "w", encoding="utf-8"
+            ) as fp:
+                for row in self.events.get_rows(countryiso):
+                    fp.write(dumps(row, separators=(",", ":")))
+                    fp.write("\n")
+        metadata = {
+            "batch": batch,
+            "today": self.today.isoformat(),
+            "history_years": self.history_years,
+            "headers": self.headers,
+            "territories": sorted(self.idmc_territories),
+            "countrynamemapping": self.countrynamemapping,
+            "countrystartdate": self.countrystartdate,
+            "countryenddate": self.countryenddate,
+            "countrysubtypes": {
+                countryiso: sorted(subtypes)
+                for countryiso, subtypes in self.countrysubtypes.items()
+            },
+            "summaries": self.summaries.to_dict(),
+        }
+        save_state(metadata, join(folder, "metadata.json"))
+        logger.info(f"Saved {len(self.events)} country partitions in {folder}")
+
+    @staticmethod
+    def load_partitions_metadata(folder):
+        return load_json(join(folder, "metadata.json"))
+
+    def load_partitions(self, folder, shard_index, shard_count):
+        """Load the countries of a shard from partitions saved by
+        save_partitions. Countries are sorted and dealt out to shards in turn.
+
+        Args:
+            folder (str): Folder containing partitions
+            shard_index (int): Shard number from 1 to shard_count
+            shard_count (int): Number of shards
+
+        Returns:
+            list[dict]: Countries of shard
+        """
+        metadata = self.load_partitions_metadata(folder)
+        territories = metadata["territories"]
+        self.idmc_territories = set(territories)
+        self.history_years = metadata.get("history_years", self.history_years)
+        countryisos = territories[shard_index - 1 :: shard_count]
+        self.countrynamemapping = metadata["countrynamemapping"]
+        self.countrystartdate = metadata["countrystartdate"]
+        self.countryenddate = metadata["countryenddate"]
+        self.countrysubtypes = {
+            countryiso: set(subtypes)
+            for countryiso, subtypes in metadata["countrysubtypes"].items()
+        }
+        self.summaries = SummaryIndex.from_dict(metadata["summaries"])
+        headers = metadata["headers"]
+        self.headers = headers
+        for countryiso in countryisos:
+            if countryiso not in self.countrynamemapping:
+                continue
+            with open(
+                join(folder, "partitions", f"{countryiso}.jsonl"), encoding="utf-8"
+            ) as fp:
+                for line in fp:
+                    self.events.add(countryiso, dict(zip(headers, loads(line))))
+        self.events.close()
+        logger.info(
+            f"Shard {shard_index}/{shard_count} has {len(countryisos)} of {len(territories)} countries"
+        )
+        return [{"iso3": countryiso} for countryiso in countryisos]
+
+    def get_metadata_key(self):
+        """Get a hash of the configuration on which the metadata of the
+        generated datasets depends besides their events
+
+        Returns:
+            str: Hash of description and static dataset metadata
+        """
+        if self.metadata_key is None:
+            key = sha256()
+            key.update(self.configuration["description"].encode("utf-8"))
+            static_path = script_dir_plus_file(
+                join("config", "hdx_dataset_static.yaml"), Pipeline
+            )
+            with open(static_path, "rb") as fp:
+                key.update(fp.read())
+            self.metadata_key = key.hexdigest()
+        return self.metadata_key
+
+    def get_country_state(self, countryiso):
+        country_state = self.events.get_country_state(countryiso)
+        # The notes depend on the history window and the configuration as well
+        # as on the events
+        country_state["min_date"] = self.get_min_date()
+        country_state["metadata"] = self.get_metadata_key()
+        return country_state
+
+    @staticmethod
+    def get_name(countryiso):
+        return slugify(f"{countryiso}-idmc idu events").lower()
+
+    def get_filename(self, countryiso):
+        filename = self.get_name(countryiso).replace("-", "_")
+        return f"{filename}.csv"
+
+    def get_showcase_url(self, countryiso):
+        internal_countryname = self.countrynamemapping.get(countryiso)
+        if not internal_countryname:
+            return None
+        return f"http://www.internal-displacement.org/countries/{internal_countryname.replace(' ', '-')}/"
+
+    def probe_showcase_urls(self, showcase_probe, countryisos=None):
+        if countryisos is None:
+            countryisos = self.countrynamemapping
+        urls = {}
+        for countryiso in countryisos:
+            url = self.get_showcase_url(countryiso)
+            if url:
+                urls[countryiso] = url
+        results = showcase_probe.probe(urls.values())
+        self.showcase_urls = {
+            countryiso: results[url] for countryiso, url in urls.items()
+        }
+
     def generate_dataset_and_showcase(self, countryiso):
-        name = f"{countryiso}-idmc idu events"
+        name = self.get_name(countryiso)
         countryname = Country.get_country_name_from_iso3(countryiso)
         title = f"{countryname} - Internal Displacements Updates (IDU)"
-        name = slugify(name).lower()
         dataset = Dataset({"name": name, "title": title})
         try:
             dataset.add_country_location(countryiso)
@@ -146,19 +488,14 @@ class Pipeline:
             self.countrystartdate[countryiso], self.countryenddate[countryiso]
         )
         dataset.set_subnational(False)
-        description = self.configuration["description"].format(self.today.year - 1)
-        filename = name.replace("-", "_")
-        filename = f"{filename}.csv"
+        description = self.configuration["description"].format(self.get_min_year())
+        filename = self.get_filename(countryiso)
         resourcedata = {
             "name": filename,
             "description": f"{title}. Contains events data.",
         }
-        rows = self.events[countryiso]
         tags = {"displacement", "internally displaced persons-idp"}
-        for row in rows:
-            subtype = row["subtype"]
-            if subtype is None:
-                subtype = row["displacement_type"]
+        for subtype in self.countrysubtypes[countryiso]:
             tags.update(subtype.split("/"))
         tags = sorted(tags)
         dataset.add_tags(tags)
@@ -166,22 +503,52 @@ class Pipeline:
             f"Conflict and disaster population movement (flows) data for {countryname}. \n\n{description}"
         )
 
-        dataset.generate_resource(
-            self.folder,
-            filename,
-            rows,
-            resourcedata,
-            headers=self.headers,
-            no_empty=False,
-        )
-        internal_countryname = self.countrynamemapping.get(countryiso)
-        if not internal_countryname:
+        with self.instrumentation.phase("write_csv", countryiso):
+            if self.stream_csv:
+                # Rows were written as they were ingested
+                resource = Resource(resourcedata)
+                resource.set_format("csv")
+                resource.set_file_to_upload(self.events.get_path(countryiso))
+                dataset.add_update_resource(resource)
+                no_rows = self.events.get_row_count(countryiso)
+            else:
+                rows = self.events.get_rows(countryiso)
+                _, results = dataset.generate_resource(
+                    self.folder,
+                    filename,
+                    rows,
+                    resourcedata,
+                    headers=self.headers,
+                    no_empty=False,
+                )
+                resource = results["resource"]
+                no_rows = len(results["rows"])
+        self.instrumentation.count("rows_written", no_rows)
+        self.instrumentation.count("csv_bytes", getsize(resource.get_file_to_upload()))
+        summary_filename = filename.replace(".csv", "_summary.csv")
+        resourcedata = {
+            "name": summary_filename,
+            "description": f"{title}. Contains total figures and number of events by month, displacement type, category and subtype.",
+        }
+        with self.instrumentation.phase("write_summary", countryiso):
+            dataset.generate_resource(
+                self.folder,
+                summary_filename,
+                self.summaries.get_rows(countryiso),
+                resourcedata,
+                headers=SummaryIndex.headers,
+                no_empty=False,
+            )
+        url = self.get_showcase_url(countryiso)
+        if not url:
             return dataset, None, True
-
-        url = f"http://www.internal-displacement.org/countries/{internal_countryname.replace(' ', '-')}/"
-        try:
-            self.retriever.downloader.setup(url)
-        except DownloadError:
+        url_exists = self.showcase_urls.get(countryiso)
+        if url_exists is None:
+            try:
+                self.retriever.downloader.setup(url)
+            except DownloadError:
+                return dataset, None, True
+        elif not url_exists:
             return dataset, None, True
         showcase = Showcase(
             {
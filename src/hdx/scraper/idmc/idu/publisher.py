@@ -0,0 +1,144 @@
+#!/usr/bin/python
+"""
+Publisher:
+----------
+
+Publishes countries to HDX using a bounded pool of worker threads with an
+optional rate limit while keeping track of which countries have finished so
+that an interrupted batch only restarts the countries that did not.
+
+"""
+
+import logging
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from os.path import exists
+from threading import Lock
+
+from hdx.utilities.loader import load_text
+from hdx.utilities.path import progress_storing_folder
+from hdx.utilities.saver import save_text
+from ratelimit import limits, sleep_and_retry
+
+logger = logging.getLogger(__name__)
+
+
+class Publisher:
+    def __init__(self, info, key, max_workers=1, per_minute=0):
+        self.info = info
+        self.key = key
+        self.max_workers = max_workers
+        self.progress_file = info["folder"] / "progress.txt"
+        self.completed_file = info["folder"] / "completed.txt"
+        if exists(self.completed_file):
+            self.completed = set(load_text(self.completed_file).split())
+        else:
+            self.completed = set()
+        self.lock = Lock()
+        self.statuses = Counter()
+        self.pending = []
+        self.futures = {}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        if per_minute:
+            self.rate_limit = sleep_and_retry(
+                limits(calls=per_minute, period=60)(lambda: None)
+            )
+        else:
+            self.rate_limit = None
+
+    def iterate(self, iterator, wait=True):
+        """Iterate over the items that still need publishing, honouring
+        WHERETOSTART and skipping items completed by an interrupted batch. By
+        default, the next item is only yielded when a worker is free so that
+        preparation does not run far ahead of publishing.
+
+        Args:
+            iterator (Iterable[dict]): Iterate over this object
+            wait (bool): Wait for a free worker before each item. Defaults to True.
+
+        Returns:
+            Iterator[dict]: Items that need publishing
+        """
+        items = [
+            nextdict
+            for _, nextdict in progress_storing_folder(self.info, iterator, self.key)
+        ]
+        for nextdict in items:
+            current = nextdict[self.key]
+            if current in self.completed:
+                logger.info(f"Ignoring {current} as it was already published")
+                continue
+            self.pending.append(current)
+        self.save_progress()
+        for nextdict in items:
+            if nextdict[self.key] not in self.completed:
+                if wait:
+                    self.wait_for_worker()
+                yield nextdict
+
+    def save_progress(self):
+        # The progress file holds the first item in order that has not
+        # finished so that a restart resumes from there
+        if self.pending:
+            save_text(f"{self.key}={self.pending[0]}", self.progress_file)
+
+    def complete(self, current, status):
+        with self.lock:
+            self.statuses[status] += 1
+            self.completed.add(current)
+            self.pending.remove(current)
+            with open(self.completed_file, "a") as fp:
+                fp.write(f"{current}\n")
+            self.save_progress()
+
+    def skip(self, nextdict, status):
+        self.complete(nextdict[self.key], status)
+
+    def run(self, function, *args):
+        if self.rate_limit:
+            self.rate_limit()
+        return function(*args)
+
+    def submit(self, nextdict, function, *args):
+        future = self.executor.submit(self.run, function, *args)
+        self.futures[future] = nextdict[self.key]
+
+    def process_done(self, done):
+        error = None
+        for future in done:
+            current = self.futures.pop(future)
+            exception = future.exception()
+            if exception:
+                logger.error(f"Publishing {current} failed!")
+                error = error or exception
+            else:
+                self.complete(current, future.result())
+        if error:
+            # Let the other workers finish so their progress is recorded
+            # before stopping the batch
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            for future, current in self.futures.items():
+                if not future.cancelled() and not future.exception():
+                    self.complete(current, future.result())
+            self.futures = {}
+            raise error
+
+    def wait_for_worker(self):
+        while len(self.futures) >= self.max_workers:
+            done, _ = wait(self.futures, return_when=FIRST_COMPLETED)
+            self.process_done(done)
+
+    def wait(self):
+        """Wait for all submitted items to be published. Raises the first
+        exception raised by a worker after the others have finished.
+
+        Returns:
+            Counter: Number of items by status returned by the publish function
+        """
+        try:
+            while self.futures:
+                done, _ = wait(self.futures, return_when=FIRST_COMPLETED)
+                self.process_done(done)
+        finally:
+            self.executor.shutdown(wait=True)
+        return self.statuses
@@ -0,0 +1,87 @@
+#!/usr/bin/python
+"""
+Saved feed:
+-----------
+
+Saves the IDU feed gzip compressed for replaying with use_saved, keeping only
+events that end on or after the earliest date used by the pipeline. That date
+is recorded in the file so that a replay which needs earlier events, for
+example with a larger history window, fails rather than silently publishing
+fewer events. Otherwise the saved feed gives the same result for any later
+replay while being much smaller and faster to load than the raw feed.
+
+"""
+
+import gzip
+import json
+import logging
+from os import replace
+
+import ijson
+
+logger = logging.getLogger(__name__)
+
+saved_filename = "idmc_idu.json.gz"
+
+
+def write_saved_events(events, path, min_date, compresslevel=6):
+    """Write events that end on or after min_date to a gzipped JSON object
+    with min_date and the array of events as they are iterated. The file is
+    only put in place once all events have been iterated.
+
+    Args:
+        events (Iterable[dict]): Events
+        path (str): Path of saved feed
+        min_date (str): Earliest end date of events to save
+        compresslevel (int): Gzip compression level. Defaults to 6.
+
+    Returns:
+        Iterator[dict]: Events
+    """
+    temp_path = f"{path}.tmp"
+    saved = 0
+    with gzip.open(
+        temp_path, "wt", encoding="utf-8", compresslevel=compresslevel
+    ) as fp:
+        fp.write(f'{{"min_date":{json.dumps(min_date)},"events":[')
+        for event in events:
+            if event["displacement_end_date"] >= min_date:
+                if saved:
+                    fp.write(",")
+                fp.write(json.dumps(event, separators=(",", ":")))
+                saved += 1
+            yield event
+        fp.write("]}")
+    replace(temp_path, path)
+    logger.info(f"Saved {saved} events in {path}")
+
+
+def read_saved_events(path, stream=False, min_date=None):
+    """Read events from saved feed checking that it has all the events that
+    end on or after min_date
+
+    Args:
+        path (str): Path of saved feed
+        stream (bool): Whether to parse incrementally. Defaults to False.
+        min_date (str | None): Earliest end date of events needed. Defaults to None.
+
+    Returns:
+        Iterator[dict]: Events
+    """
+    logger.info(f"Using saved {path}")
+    with gzip.open(path, "rb") as fp:
+        if stream:
+            # min_date is written ahead of the events
+            saved_min_date = next(ijson.items(fp, "min_date"))
+        else:
+            saved = json.load(fp)
+            saved_min_date = saved["min_date"]
+        if min_date and min_date < saved_min_date:
+            raise ValueError(
+                f"Saved feed {path} only has events ending from {saved_min_date} but events from {min_date} are needed! Save the feed again with the same history window."
+            )
+        if stream:
+            fp.seek(0)
+            yield from ijson.items(fp, "events.item", use_float=True)
+        else:
+            yield from saved["events"]
@@ -0,0 +1,91 @@
+#!/usr/bin/python
+"""
+Showcase URL probing:
+---------------------
+
+Checks concurrently whether IDMC country pages exist using a pooled session,
+caching pages known to exist on disk for a configurable number of days so
+that they are not requested on every run.
+
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from os.path import exists
+
+from hdx.utilities.dateparse import now_utc, parse_date
+from hdx.utilities.loader import load_json
+from hdx.utilities.session import get_session
+
+from hdx.scraper.idmc.idu.state import save_state
+
+logger = logging.getLogger(__name__)
+
+
+class ShowcaseProbe:
+    def __init__(
+        self,
+        cache_path=None,
+        ttl_days=7,
+        max_workers=8,
+        timeout=30,
+        session=None,
+    ):
+        self.cache_path = cache_path
+        self.ttl = timedelta(days=ttl_days)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        if session is None:
+            session = get_session()
+        self.session = session
+        if cache_path and exists(cache_path):
+            self.cache = load_json(cache_path)
+        else:
+            self.cache = {}
+
+    def is_cached(self, url, now):
+        checked = self.cache.get(url)
+        if not checked:
+            return False
+        return now - parse_date(checked) < self.ttl
+
+    def check_url(self, url):
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                return response.ok
+        except Exception:
+            logger.exception(f"Checking {url} failed!")
+            return False
+
+    def probe(self, urls):
+        """Check which of the given urls exist, using the cache for urls known
+        to exist and requesting the rest concurrently
+
+        Args:
+            urls (Iterable[str]): Urls to check
+
+        Returns:
+            dict[str, bool]: Whether each url exists
+        """
+        now = now_utc()
+        results = {}
+        to_check = []
+        for url in urls:
+            if self.is_cached(url, now):
+                results[url] = True
+            else:
+                to_check.append(url)
+        logger.info(f"Checking {len(to_check)} showcase urls ({len(results)} cached)")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for url, url_exists in zip(
+                to_check, executor.map(self.check_url, to_check)
+            ):
+                results[url] = url_exists
+                if url_exists:
+                    self.cache[url] = now.isoformat()
+                else:
+                    self.cache.pop(url, None)
+        if self.cache_path:
+            save_state(self.cache, self.cache_path)
+        return results
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+"""
+Stages:
+-------
+
+Runs a stage of a run concurrently with the next one by producing the items of
+an iterable in a background thread and handing them over through a bounded
+queue, so that a slow consumer holds back the producer rather than items
+piling up in memory. Exceptions raised by the producer are raised again in the
+consumer.
+
+"""
+
+from queue import Full, Queue
+from threading import Event, Thread
+
+
+class Stage:
+    done = object()
+
+    def __init__(self, name, iterable, maxsize=1, batch_size=1):
+        self.name = name
+        self.iterable = iterable
+        self.queue = Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.stopped = Event()
+        self.thread = None
+
+    def put(self, item):
+        # Give up if the consumer has stopped so that the thread can finish
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce(self):
+        try:
+            batch = []
+            for item in self.iterable:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    if not self.put(batch):
+                        return
+                    batch = []
+            if batch and not self.put(batch):
+                return
+            self.put(self.done)
+        except BaseException as e:
+            self.put(e)
+
+    def __iter__(self):
+        self.thread = Thread(target=self.produce, name=self.name, daemon=True)
+        self.thread.start()
+        try:
+            while True:
+                batch = self.queue.get()
+                if batch is self.done:
+                    break
+                if isinstance(batch, BaseException):
+                    raise batch
+                yield from batch
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop the producer and wait for its thread to finish
+
+        Returns:
+            None
+        """
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
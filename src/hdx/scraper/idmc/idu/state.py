@@ -0,0 +1,173 @@
+#!/usr/bin/python
+"""
+Run state:
+----------
+
+Persists per country event ids with their created_at timestamps, a
+fingerprint of the retained rows and the minimum date and configuration that
+the dataset metadata depends on so that countries which have not changed
+since the last run can be skipped. Also persists a manifest of hashes
+of what was last uploaded to HDX for each dataset so that unchanged uploads
+can be skipped.
+
+"""
+
+import logging
+from hashlib import sha256
+from json import dumps
+from os import replace
+from os.path import exists
+from threading import Lock
+
+from hdx.utilities.file_hashing import get_size_and_hash
+from hdx.utilities.loader import load_json
+from hdx.utilities.saver import save_json
+
+logger = logging.getLogger(__name__)
+
+
+def save_state(state, path):
+    # Write to a temporary file first so an interrupted run cannot leave a
+    # truncated file behind
+    temp_path = f"{path}.tmp"
+    save_json(state, temp_path)
+    replace(temp_path, path)
+
+
+class RunState:
+    def __init__(self, path, save_every=50):
+        self.path = path
+        if exists(path):
+            self.countries = load_json(path)["countries"]
+        else:
+            self.countries = {}
+        self.save_every = save_every
+        self.unsaved = 0
+        self.lock = Lock()
+        self.save_lock = Lock()
+
+    def get_changes(self, countryiso, country_state):
+        """Get the number of added, updated and removed events for a country
+        compared with the last run
+
+        Args:
+            countryiso (str): Country ISO3 code
+            country_state (dict): Current events and fingerprint of the country
+
+        Returns:
+            tuple[int, int, int]: Number of added, updated and removed events
+        """
+        previous_events = self.countries.get(countryiso, {}).get("events", {})
+        events = country_state["events"]
+        added = 0
+        updated = 0
+        for event_id, created_at in events.items():
+            previous_created_at = previous_events.get(event_id)
+            if previous_created_at is None:
+                added += 1
+            elif previous_created_at != created_at:
+                updated += 1
+        removed = len(previous_events.keys() - events.keys())
+        return added, updated, removed
+
+    def is_unchanged(self, countryiso, country_state):
+        """Check if the events of a country and the history window and
+        configuration on which its metadata depends are unchanged since the
+        last run
+
+        Args:
+            countryiso (str): Country ISO3 code
+            country_state (dict): Current events, fingerprint, minimum date and metadata key of the country
+
+        Returns:
+            bool: True if unchanged, False if not
+        """
+        previous = self.countries.get(countryiso)
+        if previous is None:
+            return False
+        for key in ("fingerprint", "min_date", "metadata"):
+            if previous.get(key) != country_state.get(key):
+                return False
+        return previous["events"] == country_state["events"]
+
+    def update(self, countryiso, country_state):
+        """Update the state of a country, saving the state file once
+        save_every countries have been updated since it was last saved
+
+        Args:
+            countryiso (str): Country ISO3 code
+            country_state (dict): Current events, fingerprint, minimum date and metadata key of the country
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.countries[countryiso] = country_state
+            self.unsaved += 1
+            if self.unsaved < self.save_every:
+                return
+        self.save()
+
+    def save(self):
+        with self.save_lock:
+            with self.lock:
+                if not self.unsaved:
+                    return
+                # Country states are replaced rather than changed so a shallow
+                # copy can be written without holding up updates
+                countries = dict(self.countries)
+                self.unsaved = 0
+            save_state({"countries": countries}, self.path)
+
+
+class UploadManifest:
+    def __init__(self, path):
+        self.path = path
+        if exists(path):
+            self.hashes = load_json(path)["hashes"]
+        else:
+            self.hashes = {}
+        self.lock = Lock()
+
+    @staticmethod
+    def get_upload_hash(dataset, showcase):
+        """Get a stable hash of the dataset and showcase metadata and the
+        files of the dataset's resources
+
+        Args:
+            dataset (Dataset): Dataset to upload
+            showcase (Showcase | None): Showcase to upload
+
+        Returns:
+            str: Hash of what would be uploaded
+        """
+        resources = []
+        for resource in dataset.get_resources():
+            file_to_upload = resource.get_file_to_upload()
+            if file_to_upload:
+                _, file_hash = get_size_and_hash(file_to_upload, resource["format"])
+            else:
+                file_hash = None
+            resources.append({"metadata": resource.data, "hash": file_hash})
+        upload = {
+            "dataset": dataset.data,
+            "resources": resources,
+            "showcase": showcase.data if showcase else None,
+        }
+        upload = dumps(upload, sort_keys=True, default=str)
+        return sha256(upload.encode("utf-8")).hexdigest()
+
+    def is_unchanged(self, name, upload_hash):
+        return self.hashes.get(name) == upload_hash
+
+    def update(self, name, upload_hash):
+        with self.lock:
+            self.hashes[name] = upload_hash
+
+    def remove(self, name):
+        with self.lock:
+            self.hashes.pop(name, None)
+
+    def save(self):
+        with self.lock:
+            save_state({"hashes": self.hashes}, self.path)
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+"""
+Summary index:
+--------------
+
+Totals the displacement figures and number of events of each country by
+month, displacement type, category and subtype as events are ingested so that
+users do not need to download and aggregate the full event CSVs.
+
+"""
+
+from hdx.utilities.saver import save_iterable
+
+
+class SummaryIndex:
+    key_headers = ["month", "displacement_type", "category", "subtype"]
+    headers = key_headers + ["events", "figure"]
+
+    def __init__(self):
+        self.countries = {}
+
+    def add(self, countryiso, event):
+        """Add an event to the totals of a country
+
+        Args:
+            countryiso (str): Country ISO3 code
+            event (dict): Event
+
+        Returns:
+            None
+        """
+        date = event["displacement_date"] or event["displacement_start_date"]
+        key = (
+            date[:7],
+            event["displacement_type"],
+            event["category"],
+            event["subtype"],
+        )
+        totals = self.countries.get(countryiso)
+        if totals is None:
+            totals = self.countries[countryiso] = {}
+        total = totals.get(key)
+        if total is None:
+            total = totals[key] = [0, 0]
+        total[0] += 1
+        total[1] += event["figure"] or 0
+
+    @staticmethod
+    def sort_key(item):
+        return tuple("" if value is None else value for value in item[0])
+
+    def get_rows(self, countryiso):
+        totals = self.countries.get(countryiso, {})
+        return [
+            [*key, *total] for key, total in sorted(totals.items(), key=self.sort_key)
+        ]
+
+    def to_dict(self):
+        return {countryiso: self.get_rows(countryiso) for countryiso in self.countries}
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        for countryiso, rows in data.items():
+            index.countries[countryiso] = {tuple(row[:4]): row[4:] for row in rows}
+        return index
+
+    def write_global(self, path):
+        """Write the totals of all countries to a CSV
+
+        Args:
+            path (str): Path of CSV
+
+        Returns:
+            None
+        """
+        rows = [
+            [countryiso, *row]
+            for countryiso in sorted(self.countries)
+            for row in self.get_rows(countryiso)
+        ]
+        save_iterable(path, rows, headers=["iso3", *self.headers], format="csv")
+
+    def __contains__(self, countryiso):
+        return countryiso in self.countries
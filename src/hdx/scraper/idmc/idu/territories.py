@@ -0,0 +1,130 @@
+#!/usr/bin/python
+"""
+Territory lookup:
+-----------------
+
+Lookup of the IDMC territories to publish, derived from IDMC_territories.csv
+by leaving out iso3 codes unknown to the country data and high income
+countries. The lookup can be cached on disk keyed by a hash of the CSV content
+and of the country data used so that it is only rebuilt when either changes.
+
+"""
+
+import logging
+from hashlib import sha256
+from json import dumps
+from os.path import exists
+
+from hdx.location.country import Country
+from hdx.utilities.loader import load_json
+
+from hdx.scraper.idmc.idu.state import save_state
+
+logger = logging.getLogger(__name__)
+
+
+class TerritoryLookup:
+    def __init__(self, names, unknown_countryisos=(), high_income_countries=()):
+        self.names = names
+        self.unknown_countryisos = list(unknown_countryisos)
+        self.high_income_countries = list(high_income_countries)
+
+    @staticmethod
+    def get_key(path):
+        """Get key that changes when the territories CSV or the income levels
+        in the country data change
+
+        Args:
+            path (str): Path to territories CSV
+
+        Returns:
+            str: Key
+        """
+        key = sha256()
+        with open(path, "rb") as fp:
+            key.update(fp.read())
+        countries = Country.countriesdata()["countries"]
+        income_levels = sorted(
+            (countryiso, countryinfo["World Bank Income Level"])
+            for countryiso, countryinfo in countries.items()
+        )
+        key.update(dumps(income_levels).encode())
+        return key.hexdigest()
+
+    @classmethod
+    def build(cls, downloader, path):
+        """Build lookup from territories CSV
+
+        Args:
+            downloader (Download): Download object
+            path (str): Path to territories CSV
+
+        Returns:
+            TerritoryLookup: Territory lookup
+        """
+        _, iterator = downloader.get_tabular_rows(path, dict_form=True)
+        names = {}
+        unknown_countryisos = []
+        high_income_countries = []
+        for row in iterator:
+            countryiso = row["iso3"]
+            countryinfo = Country.get_country_info_from_iso3(countryiso)
+            if not countryinfo:
+                unknown_countryisos.append(countryiso)
+                continue
+            countryname = row["idmc_short_name"]
+            income_level = countryinfo["World Bank Income Level"] or ""
+            if income_level.lower() == "high":
+                high_income_countries.append(countryname)
+                continue
+            names[countryiso] = countryname
+        return cls(names, unknown_countryisos, high_income_countries)
+
+    @classmethod
+    def load(cls, downloader, path, cache_path=None):
+        """Load lookup from cache if it is for the same territories CSV and
+        country data, otherwise build it and cache it
+
+        Args:
+            downloader (Download): Download object
+            path (str): Path to territories CSV
+            cache_path (str | None): Path to cached lookup. Defaults to None.
+
+        Returns:
+            TerritoryLookup: Territory lookup
+        """
+        if not cache_path:
+            return cls.build(downloader, path)
+        key = cls.get_key(path)
+        if exists(cache_path):
+            cache = load_json(cache_path)
+            if cache.get("key") == key:
+                return cls(
+                    cache["names"],
+                    cache["unknown_countryisos"],
+                    cache["high_income_countries"],
+                )
+            logger.info("Territories or country data changed so rebuilding lookup")
+        lookup = cls.build(downloader, path)
+        save_state(
+            {
+                "key": key,
+                "names": lookup.names,
+                "unknown_countryisos": lookup.unknown_countryisos,
+                "high_income_countries": lookup.high_income_countries,
+            },
+            cache_path,
+        )
+        return lookup
+
+    def get_name(self, countryiso):
+        return self.names.get(countryiso)
+
+    def __contains__(self, countryiso):
+        return countryiso in self.names
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
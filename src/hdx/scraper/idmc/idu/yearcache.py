@@ -0,0 +1,125 @@
+#!/usr/bin/python
+"""
+Year cache:
+-----------
+
+Caches cleaned IDU events in one JSON Lines file per year of their end date
+so that years which are closed do not need to be cleaned again on every run.
+The cache is keyed by a hash of the territories being published and a format
+version so that it is rebuilt when either changes.
+
+"""
+
+import logging
+from hashlib import sha256
+from json import dumps, loads
+from os import makedirs, remove, replace
+from os.path import exists, join
+
+from hdx.utilities.loader import load_json
+
+from hdx.scraper.idmc.idu.state import save_state
+
+logger = logging.getLogger(__name__)
+
+
+class YearCache:
+    # Increment when cleaning changes so that cached events are cleaned again
+    version = 1
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.index_path = join(folder, "years.json")
+        self.key = None
+        self.years = []
+        self.files = {}
+
+    @classmethod
+    def get_key(cls, countryisos):
+        """Get key that changes when the territories or the cache format
+        change
+
+        Args:
+            countryisos (Iterable[str]): Country ISO3 codes of territories
+
+        Returns:
+            str: Key
+        """
+        key = sha256()
+        key.update(dumps([cls.version, sorted(countryisos)]).encode())
+        return key.hexdigest()
+
+    def get_years(self, key):
+        """Get years which are cached for the given key, discarding the cache
+        if it was built for a different key
+
+        Args:
+            key (str): Key
+
+        Returns:
+            set[str]: Cached years
+        """
+        self.key = key
+        self.years = []
+        if exists(self.index_path):
+            index = load_json(self.index_path)
+            if index.get("key") == key:
+                self.years = index["years"]
+            else:
+                logger.info("Territories or cache format changed so rebuilding cache")
+        return set(self.years)
+
+    def get_path(self, year):
+        return join(self.folder, f"{year}.jsonl")
+
+    def add(self, year, event):
+        """Add a cleaned event to the partition of a year being built
+
+        Args:
+            year (str): Year of event end date
+            event (dict): Cleaned event
+
+        Returns:
+            None
+        """
+        fp = self.files.get(year)
+        if fp is None:
+            makedirs(self.folder, exist_ok=True)
+            fp = self.files[year] = open(
+                f"{self.get_path(year)}.tmp", "w", encoding="utf-8"
+            )
+        fp.write(dumps(event, ensure_ascii=False))
+        fp.write("\n")
+
+    def commit(self, years):
+        """Replace the partitions of the given years with those just built and
+        record them in the index. Years with no events get an empty partition.
+
+        Args:
+            years (Iterable[str]): Years which have been built
+
+        Returns:
+            None
+        """
+        makedirs(self.folder, exist_ok=True)
+        for year in years:
+            fp = self.files.pop(year, None)
+            path = self.get_path(year)
+            if fp is None:
+                open(path, "w", encoding="utf-8").close()
+            else:
+                fp.close()
+                replace(f"{path}.tmp", path)
+            if year not in self.years:
+                self.years.append(year)
+        for year, fp in self.files.items():
+            fp.close()
+            remove(f"{self.get_path(year)}.tmp")
+        self.files = {}
+        self.years.sort()
+        save_state({"key": self.key, "years": self.years}, self.index_path)
+
+    def read(self, year):
+        with open(self.get_path(year), encoding="utf-8") as fp:
+            for line in fp:
+                yield loads(line)
@@ -1,4 +1,6 @@
+from http.server import ThreadingHTTPServer
 from os.path import join
+from threading import Thread
 
 import pytest
 from hdx.api.configuration import Configuration
@@ -16,6 +18,22 @@ def fixtures():
     return join("tests", "fixtures")
 
 
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(handler_class):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
 @pytest.fixture(scope="session")
 def configuration():
     UserAgent.set_global("test")
@@ -0,0 +1,63 @@
+#!/usr/bin/python
+"""
+Unit tests for popup text cleaner
+
+"""
+
+import json
+from os.path import join
+
+from benchmarks.legacy import clean_popup
+
+from hdx.scraper.idmc.idu.cleaner import PopupCleaner
+
+
+class TestPopupCleaner:
+    popups = [
+        "",
+        "No markup at all",
+        "<b>Title</b>",
+        "<b> Title </b> <br> Body <br>",
+        "a<br>b <br>c<br> d <br> e",
+        "a\t\tb \t c\n\nd",
+        "<b>  <br>\t</b>  .  <b></b>",
+        "<<br>b>x</b></b> <br><b><br> y",
+        'Text <br> <a href="https://example.org/a"target="_blank">Source</a>',
+        'Text <br> <a href=\\"https://example.org/b\\"target=\\"_blank\\">S</a>',
+    ]
+
+    def test_clean_popup(self, fixtures):
+        with open(join(fixtures, "idmc_idu.json")) as fp:
+            popups = [event["standard_popup_text"] for event in json.load(fp)]
+        cleaner = PopupCleaner()
+        for popup in popups + self.popups:
+            assert cleaner.clean_popup(popup) == clean_popup(popup)
+        assert cleaner.clean_popup(self.popups[3]) == ("Title. Body", None)
+        assert cleaner.clean_popup(self.popups[8]) == (
+            "Text",
+            "https://example.org/a",
+        )
+        hits = cleaner.clean_popup.cache_info().hits
+        for popup in popups:
+            cleaner.clean_popup(popup)
+        assert cleaner.clean_popup.cache_info().hits == hits + len(popups)
+
+    def test_clean_events(self):
+        events = [
+            {
+                "id": 1,
+                "standard_popup_text": "<b> Title </b> <br> Body",
+                "standard_info_text": "<b> Title </b>",
+                "created_at": "2023-11-08T19:37:23.870Z",
+            }
+        ]
+        cleaned = list(PopupCleaner().clean_events(events))
+        assert cleaned == [
+            {
+                "id": 1,
+                "created_at": "2023-11-08T19:37:23.870Z",
+                "description": "Title. Body",
+                "link": None,
+            }
+        ]
+        assert list(cleaned[0].keys()) == ["id", "created_at", "description", "link"]
@@ -0,0 +1,110 @@
+#!/usr/bin/python
+"""
+Unit tests for event store
+
+"""
+
+import json
+from os.path import exists, join
+
+from hdx.utilities.path import temp_dir
+
+from hdx.scraper.idmc.idu.events import EventStore, SpillingEventStore
+
+
+class TestEventStore:
+    def test_event_store(self):
+        events = [
+            {"id": 1, "iso3": "IND", "subtype": "Flood", "figure": 2},
+            {"id": 2, "iso3": "AFG", "subtype": None, "figure": 5},
+            {"id": 3, "iso3": "IND", "subtype": "Flood", "figure": 9},
+        ]
+        store = EventStore()
+        for event in json.loads(json.dumps(events)):
+            store.add(event["iso3"], event)
+        assert store.headers == ["id", "iso3", "subtype", "figure"]
+        assert len(store) == 2
+        assert list(store) == ["IND", "AFG"]
+        assert "IND" in store
+        assert "PAK" not in store
+        assert store.get_rows("IND") == [(1, "IND", "Flood", 2), (3, "IND", "Flood", 9)]
+        assert store.get_rows("PAK") == []
+        figure_index = store.indices["figure"]
+        assert [row[figure_index] for row in store.get_rows("IND")] == [2, 9]
+        first, second = store.get_rows("IND")
+        assert first[2] is second[2]
+
+    def test_sort(self):
+        events = [
+            {
+                "id": i,
+                "iso3": "IND",
+                "displacement_start_date": start_date,
+                "created_at": "2023-01-01",
+            }
+            for i, start_date in (
+                (1, "2023-01-02"),
+                (2, "2023-01-01"),
+                (10, "2023-01-01"),
+            )
+        ]
+        store = EventStore()
+        reversed_store = EventStore()
+        for event in events:
+            store.add("IND", event)
+        for event in reversed(events):
+            reversed_store.add("IND", event)
+        # The fingerprint does not depend on the order of rows
+        assert (
+            store.get_country_state("IND")["fingerprint"]
+            == reversed_store.get_country_state("IND")["fingerprint"]
+        )
+        store.close()
+        reversed_store.close()
+        # Newest first by start date then id
+        assert [row[0] for row in store.get_rows("IND")] == [1, 10, 2]
+        assert store.get_rows("IND") == reversed_store.get_rows("IND")
+
+    def test_spilling_event_store(self):
+        events = [
+            {"id": i, "iso3": iso3, "created_at": f"2023-01-0{i}", "figure": 1.5 * i}
+            for i, iso3 in enumerate(("IND", "AFG", "IND", "PAK", "IND"), 1)
+        ]
+        store = EventStore()
+        with temp_dir(
+            "test_spilling_event_store", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            spilling_store = SpillingEventStore(join(folder, "events"), 2)
+            for event in events:
+                store.add(event["iso3"], event)
+                spilling_store.add(event["iso3"], event)
+            # The last event is still in memory
+            assert spilling_store.rows == {"IND": [(5, "IND", "2023-01-05", 7.5)]}
+            assert exists(join(folder, "events", "AFG.jsonl"))
+            assert len(spilling_store) == 3
+            assert sorted(spilling_store) == ["AFG", "IND", "PAK"]
+            assert "PAK" in spilling_store
+            assert "SDN" not in spilling_store
+            for countryiso in store:
+                assert list(spilling_store.get_rows(countryiso)) == store.get_rows(
+                    countryiso
+                )
+                assert spilling_store.get_country_state(
+                    countryiso
+                ) == store.get_country_state(countryiso)
+            figure_index = spilling_store.indices["figure"]
+            assert [row[figure_index] for row in spilling_store.get_rows("IND")] == [
+                1.5,
+                4.5,
+                7.5,
+            ]
+
+            # A store re-created on the folder of an earlier run does not
+            # keep its rows
+            spilling_store = SpillingEventStore(join(folder, "events"), 2)
+            for event in events:
+                spilling_store.add(event["iso3"], event)
+            for countryiso in store:
+                assert list(spilling_store.get_rows(countryiso)) == store.get_rows(
+                    countryiso
+                )
@@ -0,0 +1,84 @@
+#!/usr/bin/python
+"""
+Unit tests for fake CKAN server and publish benchmark
+
+"""
+
+from benchmarks.bench_publish import prepare_folder, run_publish
+from benchmarks.fakeckan import FakeCKAN
+from benchmarks.synthetic import get_countries
+from hdx.api.configuration import Configuration
+from hdx.api.locations import Locations
+from hdx.data.resource import Resource
+from hdx.data.vocabulary import Vocabulary
+from hdx.utilities.path import temp_dir
+from hdx.utilities.useragent import UserAgent
+
+
+class TestFakeCKAN:
+    def test_handle(self):
+        ckan = FakeCKAN(fail_actions={"package_create"})
+        status, response, country = ckan.handle(
+            "package_show", "application/json", b'{"id": "ind-idmc-idu-events"}'
+        )
+        assert status == 404
+        assert response["error"]["__type"] == "Not Found Error"
+        assert country == "IND"
+        status, _, country = ckan.handle(
+            "package_create", "application/json", b'{"name": "ind-idmc-idu-events"}'
+        )
+        assert status == 503
+        assert country == "IND"
+        status, _, _ = ckan.handle("start", "application/json", b"{}")
+        assert status == 400
+
+    def test_publish(self, configuration, monkeypatch):
+        # The benchmark replaces the global HDX configuration so restore it
+        # after the test
+        for cls, attribute in (
+            (Configuration, "_configuration"),
+            (Locations, "_validlocations"),
+            (Vocabulary, "_tags_dict"),
+            (Vocabulary, "_approved_vocabulary"),
+            (Resource, "_formats_dict"),
+            (UserAgent, "user_agent"),
+        ):
+            monkeypatch.setattr(cls, attribute, getattr(cls, attribute))
+        countries = [
+            country for country in get_countries() if country[0] in ("AFG", "IND")
+        ]
+        with temp_dir(
+            "test_fake_ckan", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            showcase_cache = prepare_folder(folder, 50, countries=countries)
+            with FakeCKAN(action_latency={"package_revise": 0.01}) as ckan:
+                created, updated = run_publish(folder, ckan, showcase_cache, runs=2)
+                assert sorted(
+                    package["name"] for package in ckan.packages.values()
+                ) == [
+                    "afg-idmc-idu-events",
+                    "ind-idmc-idu-events",
+                ]
+                assert len(ckan.associations) == 2
+                assert ckan.uploads
+
+        assert created["totals"]["failures"] == 0
+        assert created["countries"]["-"]["endpoints"] == {
+            "organization_list_for_user": 1,
+            "package_search": 1,
+            "user_show": 1,
+        }
+        endpoints = created["countries"]["IND"]["endpoints"]
+        assert endpoints["package_create"] == 1
+        assert endpoints["package_revise"] == 1
+        assert endpoints["ckanext_showcase_create"] == 1
+        assert endpoints["ckanext_showcase_package_association_create"] == 1
+        assert created["endpoints"]["package_revise"]["requests"] == 2
+        assert created["endpoints"]["package_revise"]["seconds"] >= 0.02
+        assert created["endpoints"]["package_revise"]["request_bytes"] > 0
+
+        endpoints = updated["countries"]["IND"]["endpoints"]
+        assert "package_create" not in endpoints
+        assert endpoints["package_revise"] == 1
+        assert endpoints["ckanext_showcase_update"] == 1
+        assert sorted(updated["countries"]) == ["-", "AFG", "IND"]
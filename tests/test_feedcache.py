@@ -0,0 +1,138 @@
+#!/usr/bin/python
+"""
+Unit tests for IDU feed cache
+
+"""
+
+import json
+from http.server import BaseHTTPRequestHandler
+from os.path import exists, join
+
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.downloader import Download
+from hdx.utilities.loader import load_json
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+
+from hdx.scraper.idmc.idu.feedcache import FeedCache
+from hdx.scraper.idmc.idu.pipeline import Pipeline
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    body = b"[]"
+    etag = '"1"'
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.headers.get("If-None-Match"))
+        if self.etag and self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        if self.etag:
+            self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestFeedCache:
+    events = [{"id": 1, "iso3": "IND"}, {"id": 2, "iso3": "AFG"}]
+
+    def test_fetch(self, configuration, stub_server):
+        FeedHandler.body = json.dumps(self.events).encode()
+        url = stub_server(FeedHandler)
+        with temp_dir(
+            "test_feed_cache", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                feed = FeedCache(folder)
+                path, changed = feed.fetch(downloader, url)
+                assert changed is True
+                assert load_json(path) == self.events
+                # Validators are only saved once the batch completes
+                assert not exists(join(folder, "validators.json"))
+                feed.commit()
+                assert load_json(feed.path) == self.events
+
+                feed = FeedCache(folder)
+                path, changed = feed.fetch(downloader, url)
+                assert changed is False
+                assert path == feed.path
+                assert FeedHandler.requests == [None, '"1"']
+
+                # Without validators, the content hash is compared
+                FeedHandler.etag = None
+                path, changed = feed.fetch(downloader, url)
+                assert changed is False
+                assert load_json(path) == self.events
+                feed.commit()
+                assert FeedCache(folder).get_request_headers() == {}
+
+                # A different history window or configuration is a change
+                FeedHandler.etag = '"1"'
+                path, changed = feed.fetch(downloader, url)
+                feed.commit()
+                path, changed = feed.fetch(downloader, url, "2022-01-01", "abc")
+                assert changed is True
+                assert path == feed.path
+                feed.commit()
+                feed = FeedCache(folder)
+                path, changed = feed.fetch(downloader, url, "2022-01-01", "abc")
+                assert changed is False
+                path, changed = feed.fetch(downloader, url, "2021-01-01", "abc")
+                assert changed is True
+                path, changed = feed.fetch(downloader, url, "2022-01-01", "def")
+                assert changed is True
+
+                FeedHandler.etag = None
+                FeedHandler.body = b"[]"
+                path, changed = feed.fetch(downloader, url)
+                assert changed is True
+                assert load_json(path) == []
+
+    def test_pipeline_fetch_feed(self, configuration, stub_server):
+        FeedHandler.body = json.dumps(self.events).encode()
+        FeedHandler.etag = '"2"'
+        url = stub_server(FeedHandler)
+        with temp_dir(
+            "test_pipeline_feed_cache", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(downloader, folder, folder, folder, False, False)
+                feed = FeedCache(join(folder, "feed"))
+                configuration = {"url": url, "description": "Since {}"}
+                today = parse_date("2023-11-14")
+                pipeline = Pipeline(
+                    configuration, retriever, today, folder, feed_cache=feed
+                )
+                assert pipeline.fetch_feed() is True
+                assert list(pipeline.get_events()) == self.events
+                feed.commit()
+
+                pipeline = Pipeline(
+                    configuration,
+                    retriever,
+                    today,
+                    folder,
+                    stream=True,
+                    feed_cache=feed,
+                )
+                assert pipeline.fetch_feed() is False
+                assert list(pipeline.get_events()) == self.events
+
+                # A longer history window needs the events to be processed again
+                pipeline = Pipeline(
+                    configuration,
+                    retriever,
+                    today,
+                    folder,
+                    feed_cache=feed,
+                    history_years=2,
+                )
+                assert pipeline.fetch_feed() is True
@@ -4,6 +4,7 @@ Unit tests for IDMC
 
 """
 
+from os import makedirs
 from os.path import join
 
 from hdx.utilities.compare import assert_files_same
@@ -138,6 +139,11 @@ class TestIDMC:
         "url": "http://www.internal-displacement.org/countries/India/",
     }
 
+    ind_summary_resource = {
+        "name": "ind_idmc_idu_events_summary.csv",
+        "description": "India - Internal Displacements Updates (IDU). Contains total figures and number of events by month, displacement type, category and subtype.",
+        "format": "csv",
+    }
     afg_dataset = {
         "groups": [{"name": "afg"}],
         "name": "afg-idmc-idu-events",
@@ -156,6 +162,20 @@ class TestIDMC:
                 pipeline.get_idmc_territories()
                 countries = pipeline.get_countriesdata()
                 assert len(countries) == 167
+                # The feed is downloaded and parsed in separate phases
+                summary = pipeline.instrumentation.get_summary()
+                assert summary["counters"]["feed_bytes"] > 0
+                assert "download" in summary["phases"]
+                assert "parse" in summary["phases"]
+                country_state = pipeline.get_country_state("IND")
+                assert len(country_state["events"]) == 113
+                assert country_state["events"]["126716"] == "2023-11-08T19:37:23.870Z"
+                assert country_state["min_date"] == "2022-01-01"
+                assert country_state == pipeline.get_country_state("IND")
+                pipeline.history_years = 2
+                assert pipeline.get_country_state("IND")["min_date"] == "2021-01-01"
+                pipeline.history_years = 1
+                assert pipeline.get_country_state("AFG")["events"] == {}
 
                 (
                     dataset,
@@ -167,7 +187,13 @@ class TestIDMC:
                 assert resources[0] == self.ind_resource
                 file = "ind_idmc_idu_events.csv"
                 assert_files_same(join(fixtures, file), join(folder, file))
+                assert resources[1] == self.ind_summary_resource
+                file = "ind_idmc_idu_events_summary.csv"
+                assert_files_same(join(fixtures, file), join(folder, file))
                 assert showcase == self.ind_showcase
+                summary = pipeline.instrumentation.get_summary()
+                assert summary["counters"]["rows_written"] == 113
+                assert summary["countries"]["IND"]["write_csv"] >= 0
 
                 # This test is for a country with no data in the time window
                 # Such datasets are deleted
@@ -180,3 +206,139 @@ class TestIDMC:
                 resources = dataset.get_resources()
                 assert len(resources) == 0
                 assert showcase is None
+
+    def test_get_countriesdata_streaming(self, configuration, fixtures):
+        with temp_dir(
+            "test_idmc_streaming", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(downloader, folder, fixtures, folder, False, True)
+                today = parse_date("2023-11-14")
+                pipeline = Pipeline(configuration, retriever, today, folder)
+                pipeline.get_idmc_territories()
+                countries = pipeline.get_countriesdata()
+
+                streaming_pipeline = Pipeline(
+                    configuration, retriever, today, folder, stream=True
+                )
+                streaming_pipeline.get_idmc_territories()
+                assert streaming_pipeline.get_countriesdata() == countries
+                assert streaming_pipeline.events.rows == pipeline.events.rows
+                assert streaming_pipeline.headers == pipeline.headers
+                assert streaming_pipeline.countrystartdate == pipeline.countrystartdate
+                assert streaming_pipeline.countryenddate == pipeline.countryenddate
+                counters = streaming_pipeline.instrumentation.counters
+                assert (
+                    counters["events_read"]
+                    == pipeline.instrumentation.counters["events_read"]
+                )
+                assert counters["feed_bytes"] > 0
+                assert "aggregate" in streaming_pipeline.instrumentation.phases
+
+    def test_generate_dataset_streaming_csv(self, configuration, fixtures):
+        with temp_dir(
+            "test_idmc_streaming_csv", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(downloader, folder, fixtures, folder, False, True)
+                today = parse_date("2023-11-14")
+                pipeline = Pipeline(
+                    configuration, retriever, today, folder, stream_csv=True
+                )
+                pipeline.get_idmc_territories()
+                countries = pipeline.get_countriesdata()
+                assert len(countries) == 167
+                country_state = pipeline.get_country_state("IND")
+                assert len(country_state["events"]) == 113
+                assert pipeline.get_country_state("AFG")["events"] == {}
+
+                (
+                    dataset,
+                    showcase,
+                    populated,
+                ) = pipeline.generate_dataset_and_showcase("IND")
+                assert dataset == self.ind_dataset
+                resources = dataset.get_resources()
+                assert resources[0] == self.ind_resource
+                file = "ind_idmc_idu_events.csv"
+                assert_files_same(join(fixtures, file), join(folder, file))
+                assert showcase == self.ind_showcase
+
+                in_memory = Pipeline(configuration, retriever, today, folder)
+                in_memory.get_idmc_territories()
+                in_memory.get_countriesdata()
+                assert in_memory.get_country_state("IND") == country_state
+
+    def test_generate_dataset_spilling(self, configuration, fixtures):
+        with temp_dir(
+            "test_idmc_spilling", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(downloader, folder, fixtures, folder, False, True)
+                today = parse_date("2023-11-14")
+                pipeline = Pipeline(
+                    configuration, retriever, today, folder, spill_threshold=10
+                )
+                pipeline.get_idmc_territories()
+                countries = pipeline.get_countriesdata()
+                assert len(countries) == 167
+                assert sum(len(rows) for rows in pipeline.events.rows.values()) < 10
+                country_state = pipeline.get_country_state("IND")
+                assert len(country_state["events"]) == 113
+                assert country_state["events"]["126716"] == "2023-11-08T19:37:23.870Z"
+
+                dataset, _, _ = pipeline.generate_dataset_and_showcase("IND")
+                assert dataset == self.ind_dataset
+                file = "ind_idmc_idu_events.csv"
+                assert_files_same(join(fixtures, file), join(folder, file))
+
+    def test_partitions(self, configuration, fixtures):
+        with temp_dir(
+            "test_idmc_partitions", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(downloader, folder, fixtures, folder, False, True)
+                today = parse_date("2023-11-14")
+                pipeline = Pipeline(configuration, retriever, today, folder)
+                pipeline.get_idmc_territories()
+                countries = pipeline.get_countriesdata()
+                partition_folder = join(folder, "partitions")
+                pipeline.save_partitions(partition_folder, "1234")
+                metadata = Pipeline.load_partitions_metadata(partition_folder)
+                assert metadata["batch"] == "1234"
+                assert parse_date(metadata["today"]) == today
+                # Stream the CSVs of the shard with IND
+                ind_shard = metadata["territories"].index("IND") % 3 + 1
+
+                shard_countries = []
+                for shard_index in (1, 2, 3):
+                    shard_folder = join(folder, f"shard{shard_index}")
+                    makedirs(shard_folder)
+                    shard = Pipeline(
+                        configuration,
+                        retriever,
+                        today,
+                        shard_folder,
+                        stream_csv=shard_index == ind_shard,
+                    )
+                    countries_in_shard = shard.load_partitions(
+                        partition_folder, shard_index, 3
+                    )
+                    shard_countries.extend(countries_in_shard)
+                    for country in countries_in_shard:
+                        countryiso = country["iso3"]
+                        assert shard.get_country_state(
+                            countryiso
+                        ) == pipeline.get_country_state(countryiso)
+                    if {"iso3": "IND"} in countries_in_shard:
+                        dataset, _, _ = shard.generate_dataset_and_showcase("IND")
+                        assert dataset == self.ind_dataset
+                        file = "ind_idmc_idu_events.csv"
+                        assert_files_same(
+                            join(fixtures, file), join(shard_folder, file)
+                        )
+                        file = "ind_idmc_idu_events_summary.csv"
+                        assert_files_same(
+                            join(fixtures, file), join(shard_folder, file)
+                        )
+                assert sorted(shard_countries, key=lambda x: x["iso3"]) == countries
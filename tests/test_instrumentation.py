@@ -0,0 +1,46 @@
+#!/usr/bin/python
+"""
+Unit tests for instrumentation
+
+"""
+
+from os.path import join
+
+import pytest
+from hdx.utilities.loader import load_json
+from hdx.utilities.path import temp_dir
+
+from hdx.scraper.idmc.idu.instrumentation import Instrumentation
+
+
+class TestInstrumentation:
+    def test_instrumentation(self):
+        instrumentation = Instrumentation()
+        with instrumentation.phase("download"):
+            pass
+        for countryiso in ("AFG", "IND", "AFG"):
+            with instrumentation.phase("publish", countryiso):
+                pass
+        with pytest.raises(ValueError):
+            with instrumentation.phase("publish", "SDN"):
+                raise ValueError("Failed!")
+        instrumentation.count("events_read", 10)
+        instrumentation.count("events_read", 5)
+        instrumentation.count("deleted")
+
+        summary = instrumentation.get_summary()
+        assert summary["phases"]["download"]["calls"] == 1
+        assert summary["phases"]["publish"]["calls"] == 4
+        assert summary["counters"] == {"events_read": 15, "deleted": 1}
+        assert list(summary["countries"]) == ["AFG", "IND", "SDN"]
+        assert list(summary["countries"]["AFG"]) == ["publish"]
+        assert summary["max_rss_kb"] > 0
+
+        with temp_dir(
+            "test_instrumentation", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "metrics.json")
+            instrumentation.save(path)
+            saved = load_json(path)
+            assert saved["counters"] == summary["counters"]
+            assert list(saved["phases"]) == ["download", "publish"]
@@ -0,0 +1,69 @@
+#!/usr/bin/python
+"""
+Unit tests for publishing to HDX
+
+"""
+
+import pytest
+from hdx.data.dataset import Dataset
+
+from hdx.scraper.idmc.idu.__main__ import (
+    get_existing_datasets,
+    parse_shard,
+    publish_country,
+)
+
+
+class ExistingDataset(Dataset):
+    deleted = []
+
+    def get_showcases(self):
+        return []
+
+    def delete_from_hdx(self):
+        self.deleted.append(self["name"])
+
+
+class TestPublish:
+    def test_delete_existing_only(self, configuration, monkeypatch):
+        searches = []
+
+        def search_in_hdx(**kwargs):
+            searches.append(kwargs)
+            return [
+                ExistingDataset({"name": "ind-idmc-idu-events"}),
+                ExistingDataset({"name": "sdn-idmc-idu-events"}),
+            ]
+
+        monkeypatch.setattr(Dataset, "search_in_hdx", search_in_hdx)
+        existing_datasets = get_existing_datasets()
+        assert searches == [
+            {
+                "fq": "owner_org:647d9d8c-4cac-4c33-b639-649aad1c2893",
+                "include_private": True,
+            }
+        ]
+        assert sorted(existing_datasets) == [
+            "ind-idmc-idu-events",
+            "sdn-idmc-idu-events",
+        ]
+
+        def read_from_hdx(*args, **kwargs):
+            raise AssertionError("Datasets should not be read one at a time!")
+
+        monkeypatch.setattr(Dataset, "read_from_hdx", read_from_hdx)
+        statuses = [
+            publish_country(
+                Dataset({"name": name}), None, False, None, None, existing_datasets
+            )
+            for name in ("afg-idmc-idu-events", "ind-idmc-idu-events")
+        ]
+        assert statuses == ["absent", "deleted"]
+        assert ExistingDataset.deleted == ["ind-idmc-idu-events"]
+
+    def test_parse_shard(self):
+        assert parse_shard("1/4") == (1, 4)
+        assert parse_shard("4/4") == (4, 4)
+        for shard in ("0/4", "5/4", "1", "a/b"):
+            with pytest.raises(ValueError):
+                parse_shard(shard)
@@ -0,0 +1,62 @@
+#!/usr/bin/python
+"""
+Unit tests for publisher
+
+"""
+
+from threading import Lock
+
+import pytest
+from hdx.utilities.loader import load_text
+from hdx.utilities.path import temp_dir
+
+from hdx.scraper.idmc.idu.publisher import Publisher
+
+
+class TestPublisher:
+    countries = [{"iso3": iso3} for iso3 in ("AFG", "BGD", "IND", "PAK", "PHL")]
+
+    def test_publisher(self):
+        with temp_dir(
+            "test_publisher", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            info = {"folder": folder}
+            published = []
+            lock = Lock()
+
+            def publish(countryiso, fail):
+                if countryiso == fail:
+                    raise ValueError(f"{countryiso} failed")
+                with lock:
+                    published.append(countryiso)
+                return "updated"
+
+            publisher = Publisher(info, "iso3", max_workers=3, per_minute=600)
+            with pytest.raises(ValueError):
+                for nextdict in publisher.iterate(self.countries):
+                    countryiso = nextdict["iso3"]
+                    if countryiso == "BGD":
+                        publisher.skip(nextdict, "skipped")
+                        continue
+                    publisher.submit(nextdict, publish, countryiso, "IND")
+                publisher.wait()
+            assert "IND" not in publisher.completed
+            assert load_text(folder / "progress.txt") == "iso3=IND"
+
+            # A restart only publishes the countries that did not finish
+            first_published = set(published)
+            published.clear()
+            publisher = Publisher(info, "iso3", max_workers=3)
+            for nextdict in publisher.iterate(self.countries):
+                countryiso = nextdict["iso3"]
+                publisher.submit(nextdict, publish, countryiso, None)
+            statuses = publisher.wait()
+            assert "IND" in published
+            assert first_published.isdisjoint(published)
+            assert "BGD" not in published
+            assert sorted(first_published | set(published) | {"BGD"}) == [
+                nextdict["iso3"] for nextdict in self.countries
+            ]
+            assert statuses["updated"] == len(published)
+            completed = load_text(folder / "completed.txt").split()
+            assert sorted(completed) == ["AFG", "BGD", "IND", "PAK", "PHL"]
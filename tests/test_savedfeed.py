@@ -0,0 +1,77 @@
+#!/usr/bin/python
+"""
+Unit tests for compressed saved feed
+
+"""
+
+from os.path import exists, join
+
+import pytest
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.downloader import Download
+from hdx.utilities.loader import load_json
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+
+from hdx.scraper.idmc.idu.pipeline import Pipeline
+from hdx.scraper.idmc.idu.savedfeed import (
+    read_saved_events,
+    saved_filename,
+    write_saved_events,
+)
+
+
+class TestSavedFeed:
+    def test_write_read(self):
+        events = [
+            {"id": 1, "displacement_end_date": "2021-12-31T00:00:00.000Z"},
+            {"id": 2, "displacement_end_date": "2022-01-01T00:00:00.000Z"},
+            {"id": 3, "displacement_end_date": "2023-05-01T00:00:00.000Z"},
+        ]
+        with temp_dir(
+            "test_saved_feed", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, saved_filename)
+            iterator = write_saved_events(events, path, "2022-01-01")
+            assert next(iterator) == events[0]
+            # Nothing is put in place until all events are iterated
+            assert not exists(path)
+            assert list(iterator) == events[1:]
+            assert list(read_saved_events(path)) == events[1:]
+            assert list(read_saved_events(path, stream=True)) == events[1:]
+            assert list(read_saved_events(path, False, "2022-06-01")) == events[1:]
+            # Events before the saved minimum date are not in the saved feed
+            for stream in (False, True):
+                with pytest.raises(ValueError, match="only has events ending from"):
+                    list(read_saved_events(path, stream, "2021-01-01"))
+
+    def test_replay(self, configuration, fixtures):
+        today = parse_date("2023-11-14")
+        with temp_dir(
+            "test_saved_feed_replay", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            events = load_json(join(fixtures, "idmc_idu.json"))
+            list(write_saved_events(events, join(folder, saved_filename), "2022-01-01"))
+            with Download() as downloader:
+                retriever = Retrieve(downloader, folder, fixtures, folder, False, True)
+                pipeline = Pipeline(configuration, retriever, today, folder)
+                pipeline.get_idmc_territories()
+                countries = pipeline.get_countriesdata()
+
+                retriever = Retrieve(downloader, folder, folder, folder, False, True)
+                for stream in (False, True):
+                    replay = Pipeline(
+                        configuration, retriever, today, folder, stream=stream
+                    )
+                    replay.get_idmc_territories()
+                    assert replay.get_countriesdata() == countries
+                    assert replay.events.rows == pipeline.events.rows
+                    assert replay.countrystartdate == pipeline.countrystartdate
+
+                # A longer history window needs events that were not saved
+                replay = Pipeline(
+                    configuration, retriever, today, folder, history_years=2
+                )
+                replay.get_idmc_territories()
+                with pytest.raises(ValueError, match="Save the feed again"):
+                    replay.get_countriesdata()
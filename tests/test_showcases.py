@@ -0,0 +1,81 @@
+#!/usr/bin/python
+"""
+Unit tests for showcase url probing
+
+"""
+
+from http.server import BaseHTTPRequestHandler
+from os.path import join
+
+from hdx.utilities.path import temp_dir
+from hdx.utilities.session import get_session
+
+from hdx.scraper.idmc.idu.pipeline import Pipeline
+from hdx.scraper.idmc.idu.showcases import ShowcaseProbe
+
+
+class CountryPageHandler(BaseHTTPRequestHandler):
+    requested = []
+
+    def do_GET(self):
+        self.requested.append(self.path)
+        if self.path in ("/countries/India/", "/countries/Burkina-Faso/"):
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"<html></html>")
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubProbe:
+    def probe(self, urls):
+        return {url: "India" in url for url in urls}
+
+
+class TestShowcaseProbe:
+    def test_probe(self, configuration, stub_server):
+        url = stub_server(CountryPageHandler)
+        urls = [
+            f"{url}/countries/India/",
+            f"{url}/countries/Burkina-Faso/",
+            f"{url}/countries/Atlantis/",
+        ]
+        session = get_session(retry_attempts=0)
+        with temp_dir(
+            "test_showcase_probe", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            cache_path = join(folder, "showcases.json")
+            probe = ShowcaseProbe(cache_path, max_workers=3, session=session)
+            results = probe.probe(urls)
+            assert results == {urls[0]: True, urls[1]: True, urls[2]: False}
+            assert sorted(CountryPageHandler.requested) == [
+                "/countries/Atlantis/",
+                "/countries/Burkina-Faso/",
+                "/countries/India/",
+            ]
+
+            # Pages known to exist are not requested again until they expire
+            CountryPageHandler.requested.clear()
+            probe = ShowcaseProbe(cache_path, max_workers=3, session=session)
+            assert probe.probe(urls) == results
+            assert CountryPageHandler.requested == ["/countries/Atlantis/"]
+
+            CountryPageHandler.requested.clear()
+            probe = ShowcaseProbe(cache_path, ttl_days=0, session=session)
+            assert probe.probe(urls) == results
+            assert len(CountryPageHandler.requested) == 3
+
+    def test_probe_showcase_urls(self):
+        pipeline = Pipeline(None, None, None, None)
+        pipeline.countrynamemapping = {"IND": "India", "BFA": "Burkina Faso"}
+        assert (
+            pipeline.get_showcase_url("BFA")
+            == "http://www.internal-displacement.org/countries/Burkina-Faso/"
+        )
+        assert pipeline.get_showcase_url("AFG") is None
+        pipeline.probe_showcase_urls(StubProbe())
+        assert pipeline.showcase_urls == {"IND": True, "BFA": False}
@@ -0,0 +1,103 @@
+#!/usr/bin/python
+"""
+Unit tests for pipelined stages
+
+"""
+
+from os import makedirs
+from os.path import join
+
+import pytest
+from hdx.utilities.compare import assert_files_same
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+
+from hdx.scraper.idmc.idu.__main__ import prepare_countries
+from hdx.scraper.idmc.idu.pipeline import Pipeline
+from hdx.scraper.idmc.idu.stages import Stage
+
+
+class TestStages:
+    def test_stage(self):
+        assert list(Stage("numbers", range(10), maxsize=2, batch_size=3)) == list(
+            range(10)
+        )
+        assert list(Stage("empty", [])) == []
+
+        def fail():
+            yield 1
+            raise ValueError("Download failed!")
+
+        with pytest.raises(ValueError, match="Download failed!"):
+            list(Stage("fail", fail()))
+
+        # The producer runs at most a bounded number of items ahead and stops
+        # when the consumer does
+        produced = []
+
+        def produce():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        stage = Stage("bounded", produce(), maxsize=2)
+        iterator = iter(stage)
+        assert next(iterator) == 0
+        iterator.close()
+        assert not stage.thread.is_alive()
+        assert len(produced) <= 4
+
+    def run(self, configuration, fixtures, folder, queue_size):
+        makedirs(folder)
+        with Download() as downloader:
+            retriever = Retrieve(downloader, folder, fixtures, folder, False, True)
+            pipeline = Pipeline(
+                configuration,
+                retriever,
+                parse_date("2023-11-14"),
+                folder,
+                stream=True,
+                queue_size=queue_size,
+            )
+            pipeline.get_idmc_territories()
+            # Only these countries are valid locations in the test configuration
+            countries = [
+                country
+                for country in pipeline.get_countriesdata()
+                if country["iso3"] in ("AFG", "IND")
+            ]
+            prepared = prepare_countries(
+                pipeline, countries, None, pipeline.instrumentation
+            )
+            if queue_size:
+                prepared = Stage("generate", prepared, queue_size)
+            return pipeline, list(prepared)
+
+    def test_pipelined_run(self, configuration, fixtures):
+        with temp_dir(
+            "test_pipelined_run", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            sequential_folder = join(folder, "sequential")
+            pipelined_folder = join(folder, "pipelined")
+            sequential, sequential_prepared = self.run(
+                configuration, fixtures, sequential_folder, 0
+            )
+            pipelined, pipelined_prepared = self.run(
+                configuration, fixtures, pipelined_folder, 2
+            )
+            assert pipelined.events.rows == sequential.events.rows
+            assert pipelined.summaries.to_dict() == sequential.summaries.to_dict()
+            assert len(pipelined_prepared) == 2
+            assert pipelined_prepared == sequential_prepared
+            nextdict, status, dataset, _, _, _ = next(
+                prepared for prepared in pipelined_prepared if prepared[4]
+            )
+            assert nextdict == {"iso3": "IND"}
+            assert status is None
+            assert dataset["name"] == "ind-idmc-idu-events"
+            for file in ("ind_idmc_idu_events.csv", "ind_idmc_idu_events_summary.csv"):
+                assert_files_same(
+                    join(sequential_folder, file), join(pipelined_folder, file)
+                )
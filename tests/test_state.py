@@ -0,0 +1,101 @@
+#!/usr/bin/python
+"""
+Unit tests for run state
+
+"""
+
+from os.path import exists, join
+
+from hdx.data.dataset import Dataset
+from hdx.utilities.path import temp_dir
+
+from hdx.scraper.idmc.idu.state import RunState, UploadManifest
+
+
+class TestRunState:
+    country_state = {
+        "events": {"1": "2023-11-08T19:37:23.870Z", "2": "2023-10-15T23:39:28.993Z"},
+        "fingerprint": "abc",
+        "min_date": "2022-01-01",
+        "metadata": "123",
+    }
+
+    def test_run_state(self):
+        with temp_dir(
+            "test_run_state", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "state.json")
+            run_state = RunState(path)
+            assert run_state.is_unchanged("IND", self.country_state) is False
+            assert run_state.get_changes("IND", self.country_state) == (2, 0, 0)
+            run_state.update("IND", self.country_state)
+            run_state.save()
+
+            run_state = RunState(path)
+            assert run_state.is_unchanged("IND", self.country_state) is True
+            country_state = {
+                "events": {
+                    "1": "2023-11-09T10:00:00.000Z",
+                    "3": "2023-11-10T10:00:00.000Z",
+                },
+                "fingerprint": "def",
+            }
+            assert run_state.is_unchanged("IND", country_state) is False
+            assert run_state.get_changes("IND", country_state) == (1, 1, 1)
+
+    def test_run_state_batches(self):
+        with temp_dir(
+            "test_run_state_batches", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "state.json")
+            run_state = RunState(path, save_every=2)
+            run_state.update("AFG", self.country_state)
+            # Saved once save_every countries are updated
+            assert not exists(path)
+            run_state.update("IND", self.country_state)
+            assert sorted(RunState(path).countries) == ["AFG", "IND"]
+            run_state.update("PAK", self.country_state)
+            assert sorted(RunState(path).countries) == ["AFG", "IND"]
+            run_state.save()
+            assert sorted(RunState(path).countries) == ["AFG", "IND", "PAK"]
+            # A longer history window or changed configuration changes the
+            # notes even if the events are the same
+            country_state = self.country_state | {"min_date": "2021-01-01"}
+            assert run_state.is_unchanged("IND", country_state) is False
+            country_state = self.country_state | {"metadata": "456"}
+            assert run_state.is_unchanged("IND", country_state) is False
+
+    def test_upload_manifest(self, configuration):
+        with temp_dir(
+            "test_upload_manifest", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+
+            def generate_dataset(rows):
+                dataset = Dataset({"name": "test-dataset", "title": "Test"})
+                dataset.generate_resource(
+                    folder,
+                    "test.csv",
+                    rows,
+                    {"name": "test.csv", "description": "Test"},
+                    headers=["id", "figure"],
+                )
+                return dataset
+
+            path = join(folder, "manifest.json")
+            manifest = UploadManifest(path)
+            dataset = generate_dataset([{"id": 1, "figure": 10}])
+            upload_hash = manifest.get_upload_hash(dataset, None)
+            assert manifest.is_unchanged("test-dataset", upload_hash) is False
+            manifest.update("test-dataset", upload_hash)
+            manifest.save()
+
+            manifest = UploadManifest(path)
+            dataset = generate_dataset([{"id": 1, "figure": 10}])
+            assert manifest.get_upload_hash(dataset, None) == upload_hash
+            assert manifest.is_unchanged("test-dataset", upload_hash) is True
+            dataset["notes"] = "Changed notes"
+            assert manifest.get_upload_hash(dataset, None) != upload_hash
+            dataset = generate_dataset([{"id": 1, "figure": 11}])
+            assert manifest.get_upload_hash(dataset, None) != upload_hash
+            manifest.remove("test-dataset")
+            assert manifest.is_unchanged("test-dataset", upload_hash) is False
@@ -0,0 +1,59 @@
+#!/usr/bin/python
+"""
+Unit tests for summary index
+
+"""
+
+from os.path import join
+
+from hdx.utilities.loader import load_text
+from hdx.utilities.path import temp_dir
+
+from hdx.scraper.idmc.idu.summary import SummaryIndex
+
+
+def make_event(date, displacement_type, subtype, figure):
+    if displacement_type == "Conflict":
+        category = None
+    else:
+        category = "Weather related"
+    return {
+        "displacement_date": date,
+        "displacement_start_date": "2023-01-01T00:00:00.000Z",
+        "displacement_type": displacement_type,
+        "category": category,
+        "subtype": subtype,
+        "figure": figure,
+    }
+
+
+class TestSummaryIndex:
+    def test_summary_index(self):
+        index = SummaryIndex()
+        index.add("IND", make_event("2023-06-03T00:00:00.000Z", "Disaster", "Flood", 5))
+        index.add("IND", make_event("2023-05-30T00:00:00.000Z", "Conflict", None, 7))
+        index.add("IND", make_event("2023-06-20T00:00:00.000Z", "Disaster", "Flood", 9))
+        index.add("IND", make_event(None, "Disaster", "Storm", None))
+        index.add("AFG", make_event("2023-02-01T00:00:00.000Z", "Conflict", None, 1))
+        rows = [
+            ["2023-01", "Disaster", "Weather related", "Storm", 1, 0],
+            ["2023-05", "Conflict", None, None, 1, 7],
+            ["2023-06", "Disaster", "Weather related", "Flood", 2, 14],
+        ]
+        assert index.get_rows("IND") == rows
+        assert index.get_rows("SDN") == []
+        assert "AFG" in index
+        assert SummaryIndex.from_dict(index.to_dict()).get_rows("IND") == rows
+
+        with temp_dir(
+            "test_summary_index", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "summary.csv")
+            index.write_global(path)
+            assert load_text(path).splitlines() == [
+                "iso3,month,displacement_type,category,subtype,events,figure",
+                "AFG,2023-02,Conflict,,,1,1",
+                "IND,2023-01,Disaster,Weather related,Storm,1,0",
+                "IND,2023-05,Conflict,,,1,7",
+                "IND,2023-06,Disaster,Weather related,Flood,2,14",
+            ]
@@ -0,0 +1,39 @@
+#!/usr/bin/python
+"""
+Unit tests for synthetic IDU feed generator
+
+"""
+
+import json
+from os.path import join
+
+from benchmarks.synthetic import SyntheticFeed
+from hdx.utilities.path import temp_dir
+
+
+class TestSyntheticFeed:
+    def test_synthetic_feed(self, fixtures):
+        with open(join(fixtures, "idmc_idu.json")) as fp:
+            keys = list(json.load(fp)[0].keys())
+        events = list(SyntheticFeed(seed=1).generate(500))
+        assert events == list(SyntheticFeed(seed=1).generate(500))
+        assert events != list(SyntheticFeed(seed=2).generate(500))
+        for event in events:
+            assert list(event.keys()) == keys
+            assert "2022-01-01" <= event["displacement_start_date"] < "2024-01-01"
+            assert event["displacement_start_date"] <= event["displacement_end_date"]
+            assert event["standard_popup_text"].startswith("<b> ")
+        assert len({event["iso3"] for event in events}) > 50
+        assert {event["displacement_type"] for event in events} == {
+            "Conflict",
+            "Disaster",
+        }
+
+        with temp_dir(
+            "test_synthetic_feed", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "idmc_idu.json")
+            size = SyntheticFeed(seed=1).write(path, 500)
+            with open(path) as fp:
+                assert json.load(fp) == events
+            assert size > 0
@@ -0,0 +1,53 @@
+#!/usr/bin/python
+"""
+Unit tests for territory lookup
+
+"""
+
+from os.path import join
+from shutil import copyfile
+
+from hdx.utilities.downloader import Download
+from hdx.utilities.loader import load_json
+from hdx.utilities.path import script_dir_plus_file, temp_dir
+
+from hdx.scraper.idmc.idu.pipeline import Pipeline
+from hdx.scraper.idmc.idu.territories import TerritoryLookup
+
+
+class NoDownload:
+    def get_tabular_rows(self, *args, **kwargs):
+        raise AssertionError("Lookup should have been loaded from cache!")
+
+
+class TestTerritoryLookup:
+    def test_load(self, configuration):
+        with temp_dir(
+            "test_territory_lookup", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "IDMC_territories.csv")
+            copyfile(
+                script_dir_plus_file(join("config", "IDMC_territories.csv"), Pipeline),
+                path,
+            )
+            cache_path = join(folder, "territories.json")
+            with Download() as downloader:
+                lookup = TerritoryLookup.build(downloader, path)
+                assert len(lookup) == 167
+                assert "IND" in lookup
+                assert "USA" not in lookup
+                assert lookup.get_name("IND") == "India"
+                assert sorted(lookup.unknown_countryisos) == ["AB9", "SRK", "XKX"]
+
+                cached = TerritoryLookup.load(downloader, path, cache_path)
+                assert cached.names == lookup.names
+                cached = TerritoryLookup.load(NoDownload(), path, cache_path)
+                assert cached.names == lookup.names
+                assert cached.high_income_countries == lookup.high_income_countries
+
+                with open(path, "a", encoding="utf-8") as fp:
+                    fp.write("XYZ,,Nowhere\n")
+                key = load_json(cache_path)["key"]
+                lookup = TerritoryLookup.load(downloader, path, cache_path)
+                assert lookup.unknown_countryisos[-1] == "XYZ"
+                assert load_json(cache_path)["key"] != key
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+"""
+Unit tests for windowed download
+
+"""
+
+import json
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+from hdx.utilities.session import get_session
+
+from hdx.scraper.idmc.idu.pipeline import Pipeline
+from hdx.scraper.idmc.idu.windowed import WindowedDownload
+
+
+def make_event(event_id, end_date):
+    return {"id": event_id, "displacement_end_date": f"{end_date}.000Z"}
+
+
+events = [
+    make_event(1, "2021-12-31T23:00:00"),
+    make_event(2, "2022-01-01T00:00:00"),
+    make_event(3, "2022-02-15T00:00:00"),
+    make_event(4, "2022-03-31T12:00:00"),
+    make_event(5, "2022-07-01T00:00:00"),
+    make_event(6, "2023-11-14T08:00:00"),
+    # Ends after the date of the run
+    make_event(7, "2024-02-01T00:00:00"),
+]
+
+
+class IDUHandler(BaseHTTPRequestHandler):
+    page_size = 1
+    requests = []
+    ignore_parameters = False
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: value[0] for key, value in parse_qs(url.query).items()}
+        self.requests.append(query)
+        start = query.get("end_gte")
+        end = query.get("end_lt")
+        if start is None or self.ignore_parameters:
+            # Full feed
+            body = events
+        else:
+            matches = [
+                event
+                for event in events
+                if start <= event["displacement_end_date"]
+                and (end is None or event["displacement_end_date"] < end)
+            ]
+            page = int(query.get("page", 1))
+            offset = (page - 1) * self.page_size
+            body = {"results": matches[offset : offset + self.page_size]}
+            if offset + self.page_size < len(matches):
+                next_query = f"end_gte={start}&page={page + 1}"
+                if end:
+                    next_query = f"{next_query}&end_lt={end}"
+                body["next"] = f"http://{self.headers['Host']}{url.path}?{next_query}"
+            else:
+                body["next"] = None
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestWindowedDownload:
+    def test_get_windows(self):
+        windowed = WindowedDownload(None, None, "start", "end", months=5)
+        windows = windowed.get_windows("2022-01-01", parse_date("2023-02-10"))
+        assert windows == [
+            ("2022-01-01", "2022-06-01"),
+            ("2022-06-01", "2022-11-01"),
+            ("2022-11-01", None),
+        ]
+
+    def test_download(self, configuration, stub_server):
+        url = f"{stub_server(IDUHandler)}/idus/"
+        session = get_session(retry_attempts=0)
+        windowed = WindowedDownload(
+            session, url, "end_gte", "end_lt", months=3, max_workers=3
+        )
+        results = windowed.download("2022-01-01", parse_date("2023-11-14"))
+        assert [event["id"] for event in results] == [2, 3, 4, 5, 6, 7]
+        # 8 quarters with two extra pages for the first and one for the last
+        assert len(IDUHandler.requests) == 11
+        # The last quarter has no end so events ending after today are kept
+        assert {"end_gte": "2023-10-01"} in IDUHandler.requests
+
+        with temp_dir(
+            "test_windowed_download", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(downloader, folder, folder, folder, False, False)
+                pipeline = Pipeline(
+                    {"url": url},
+                    retriever,
+                    parse_date("2023-11-14"),
+                    folder,
+                    windowed=windowed,
+                )
+                assert list(pipeline.get_events()) == results
+
+                # Falls back to the full feed
+                IDUHandler.requests = []
+
+                def fail(window):
+                    raise ValueError("Invalid JSON!")
+
+                windowed.fetch_window = fail
+                assert list(pipeline.get_events()) == events
+                assert IDUHandler.requests == [{}]
+
+                # A server ignoring the date parameters returns events outside
+                # the windows so the full feed is downloaded instead
+                del windowed.fetch_window
+                IDUHandler.ignore_parameters = True
+                try:
+                    assert list(pipeline.get_events()) == events
+                finally:
+                    IDUHandler.ignore_parameters = False
@@ -0,0 +1,132 @@
+#!/usr/bin/python
+"""
+Unit tests for year cache
+
+"""
+
+import json
+from os import makedirs
+from os.path import join
+
+from benchmarks.synthetic import SyntheticFeed
+from hdx.utilities.compare import assert_files_same
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.loader import load_json
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+
+from hdx.scraper.idmc.idu.pipeline import Pipeline
+from hdx.scraper.idmc.idu.yearcache import YearCache
+
+
+class TestYearCache:
+    events = list(SyntheticFeed(seed=1, start_year=2019, end_year=2023).generate(800))
+    countryisos = sorted({event["iso3"] for event in events})
+
+    def aggregate(
+        self, folder, events, year_cache=None, countryisos=None, stream_csv=False
+    ):
+        pipeline = Pipeline(
+            {"description": "Since {}"},
+            None,
+            parse_date("2023-11-14"),
+            folder,
+            stream_csv=stream_csv,
+            history_years=3,
+            year_cache=year_cache,
+        )
+        pipeline.idmc_territories = set(countryisos or self.countryisos)
+        pipeline.aggregate_events(
+            json.loads(json.dumps(events)), pipeline.get_min_date()
+        )
+        pipeline.events.close()
+        return pipeline
+
+    @staticmethod
+    def get_output(pipeline):
+        return (
+            {
+                countryiso: pipeline.events.get_rows(countryiso)
+                for countryiso in pipeline.events
+            },
+            pipeline.summaries.to_dict(),
+            pipeline.countrystartdate,
+            pipeline.countryenddate,
+            pipeline.countrysubtypes,
+            {
+                countryiso: pipeline.get_country_state(countryiso)
+                for countryiso in pipeline.events
+            },
+        )
+
+    def test_year_cache(self):
+        with temp_dir(
+            "test_year_cache", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            pipeline = self.aggregate(folder, self.events)
+            assert pipeline.get_min_date() == "2020-01-01"
+            rows, *output = self.get_output(pipeline)
+            assert min(pipeline.countrystartdate.values()) < "2020-01-01"
+            assert min(pipeline.countryenddate.values()) < "2021-01-01"
+
+            cache_folder = join(folder, "years")
+            pipeline = self.aggregate(folder, self.events, YearCache(cache_folder))
+            assert load_json(join(cache_folder, "years.json"))["years"] == [
+                "2020",
+                "2021",
+            ]
+            counts = pipeline.instrumentation.counters
+            assert counts["events_cached"] == 0
+            # Building the cache does not change the output
+            assert self.get_output(pipeline) == (rows, *output)
+
+            # Closed years are read from the cache rather than the feed
+            open_events = [
+                event
+                for event in self.events
+                if event["displacement_end_date"] >= "2022-01-01"
+            ]
+            pipeline = self.aggregate(folder, open_events, YearCache(cache_folder))
+            counts = pipeline.instrumentation.counters
+            assert counts["events_cached"] > 0
+            assert counts["events_retained"] == sum(len(rows) for rows in rows.values())
+            # Rows and fingerprints do not depend on which years were cached
+            assert self.get_output(pipeline) == (rows, *output)
+            # Leading cached years are not downloaded
+            assert pipeline.get_download_min_date() == "2022-01-01"
+            # unless the feed is saved as it must be replayable without the cache
+            saved_folder = join(folder, "saved")
+            pipeline.retriever = Retrieve(
+                None, saved_folder, saved_folder, saved_folder, True, False
+            )
+            assert pipeline.get_download_min_date() == "2020-01-01"
+
+            # CSVs written as events are read are the same with and without
+            # the cache
+            uncached_folder = join(folder, "uncached")
+            makedirs(uncached_folder)
+            uncached = self.aggregate(uncached_folder, self.events, stream_csv=True)
+            cached_folder = join(folder, "cached")
+            makedirs(cached_folder)
+            cached = self.aggregate(
+                cached_folder, open_events, YearCache(cache_folder), stream_csv=True
+            )
+            assert sorted(cached.events) == sorted(uncached.events)
+            for countryiso in uncached.events:
+                filename = uncached.get_filename(countryiso)
+                assert_files_same(
+                    join(uncached_folder, filename), join(cached_folder, filename)
+                )
+                assert cached.get_country_state(
+                    countryiso
+                ) == uncached.get_country_state(countryiso)
+
+            # A change of territories rebuilds the cache
+            pipeline = self.aggregate(
+                folder, open_events, YearCache(cache_folder), self.countryisos[1:]
+            )
+            assert pipeline.instrumentation.counters["events_cached"] == 0
+            end_date_index = pipeline.events.indices["displacement_end_date"]
+            for countryiso in pipeline.events:
+                for row in pipeline.events.get_rows(countryiso):
+                    assert row[end_date_index] >= "2022-01-01"